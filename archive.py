@@ -0,0 +1,90 @@
+# archive.py
+import csv
+import io
+import os
+import zipfile
+
+# Índice de cada archivo ZIP con los documentos que contiene
+ARCHIVE_MANIFEST = 'manifest.csv'
+MANIFEST_COLUMNS = ['ID', 'NO_CONTRATO', 'ARCHIVO']
+
+
+class ArchiveWriter:
+    """
+    Escribe los documentos generados directamente en archivos ZIP.
+
+    Los documentos llegan como bytes en memoria y se agregan al ZIP actual
+    en cuanto se generan, sin pasar por archivos sueltos. Con max_bytes, al
+    llegar al límite se abre el siguiente (<nombre>_001.zip, _002.zip, ...).
+    Cada ZIP incluye un manifest.csv con ID, NO_CONTRATO y nombre de los
+    documentos que contiene, para indexarlo sin descomprimir.
+    """
+
+    def __init__(self, output_dir, base_name, max_bytes=None):
+        self.output_dir = output_dir
+        self.base_name = base_name
+        self.max_bytes = max_bytes
+        self.paths = []
+        # Nombres de los ZIP ya cerrados: solo sus documentos se pueden leer
+        self.closed = []
+        self._zip = None
+        self._file = None
+        self._rows = []
+
+    @property
+    def current_name(self):
+        """Nombre del ZIP donde se escribe el siguiente documento"""
+        return os.path.basename(self.paths[-1]) if self.paths else None
+
+    def add(self, filename, data, record_id, contract_number):
+        """
+        Agrega un documento al ZIP actual
+        Args:
+            filename (str): Nombre del documento dentro del ZIP
+            data (bytes): Contenido del documento
+            record_id: ID del registro
+            contract_number: NO_CONTRATO del registro
+        Returns:
+            str: Nombre del ZIP donde quedó el documento
+        """
+        if self._zip is None or self._is_full(len(data)):
+            self._open_next()
+        self._zip.writestr(filename, data)
+        self._rows.append((record_id, contract_number, filename))
+        return self.current_name
+
+    def _is_full(self, incoming):
+        # Un ZIP nunca queda vacío aunque el documento solo supere el límite
+        return bool(self.max_bytes and self._rows and self._file.tell() + incoming > self.max_bytes)
+
+    def _open_next(self):
+        self._close_current()
+        path = os.path.join(self.output_dir, f"{self.base_name}_{len(self.paths) + 1:03d}.zip")
+        self._file = open(path, 'wb')
+        self._zip = zipfile.ZipFile(self._file, 'w', zipfile.ZIP_DEFLATED)
+        self.paths.append(path)
+
+    def _close_current(self):
+        if self._zip is None:
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(MANIFEST_COLUMNS)
+        writer.writerows(self._rows)
+        # Con BOM para que Excel lo abra con los acentos correctos
+        self._zip.writestr(ARCHIVE_MANIFEST, buffer.getvalue().encode('utf-8-sig'))
+        self._zip.close()
+        self._file.close()
+        self.closed.append(self.current_name)
+        self._zip = self._file = None
+        self._rows = []
+
+    def close(self):
+        """Cierra el ZIP actual con su manifiesto"""
+        self._close_current()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
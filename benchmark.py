@@ -0,0 +1,312 @@
+# benchmark.py
+"""
+Mediciones de las rutas críticas de generación y manejo de datos.
+
+Trabaja en un directorio temporal con libros y plantillas sintéticos
+(sin interfaz gráfica ni red) y guarda los resultados en JSON para
+comparar corridas:
+
+    python benchmark.py
+    python benchmark.py --tamanos 100 1000 --documentos 20 --salida bench.json
+
+Por operación reporta latencias p50/p90/p99, operaciones por segundo y el
+pico de memoria residente (RSS) alcanzado durante la operación.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import pandas as pd
+from docx import Document
+
+from data_manager import DataManager, get_columns
+from formatting import format_records
+from generator import build_replacements
+from schema import get_user_fields
+from storage import PENDING, RecordFilter
+from template_engine import compile_template, replace_template_content
+
+CONTRACT_TYPES = ['adquisiciones', 'servicios']
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+
+# Plantillas sintéticas: (nombre, párrafos, tablas, variables distintas)
+TEMPLATE_SHAPES = [
+    ('corta', 20, 1, 10),
+    ('media', 200, 5, 40),
+    ('larga', 1000, 20, 65),
+]
+
+
+# ---------------------------------------------------------------------------
+# Memoria
+# ---------------------------------------------------------------------------
+
+def reset_peak_rss():
+    """Reinicia el pico de RSS del proceso (solo Linux; en otros sistemas no hace nada)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """Pico de RSS del proceso en MB, o None si el sistema no lo expone"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS lo reporta en bytes, Linux en KB
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Datos sintéticos
+# ---------------------------------------------------------------------------
+
+def synthetic_record(columns, index, rng):
+    """Registro con valores plausibles para todas las columnas"""
+    record = {}
+    for column in columns:
+        if column == 'MONTO_AUTORIZADO':
+            record[column] = f"{rng.uniform(1000, 5000000):.2f}"
+        elif column.startswith('CORREO'):
+            record[column] = f"contacto{index}@proveedor{index % 97}.com.mx"
+        elif column.startswith('FECHA'):
+            record[column] = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        else:
+            words = rng.randint(1, 12)
+            record[column] = ' '.join(f"{column.lower()}{rng.randint(0, 999)}" for _ in range(words))
+    record['ID'] = f"2025{index:013d}"
+    record['NO_CONTRATO'] = f"BENCH-{index:06d}"
+    record['GENERADO'] = 'No'
+    return record
+
+
+def build_workbook(contract_type, rows, seed=0):
+    """Escribe contratos_<tipo>.xlsx en el directorio actual con filas sintéticas"""
+    rng = random.Random(seed)
+    columns = get_columns(contract_type)
+    df = pd.DataFrame([synthetic_record(columns, i, rng) for i in range(rows)], columns=columns)
+    df.to_excel(f"contratos_{contract_type}.xlsx", index=False, engine='openpyxl')
+    for suffix in ('.journal.jsonl', '.db'):
+        path = f"contratos_{contract_type}{suffix}"
+        if os.path.exists(path):
+            os.remove(path)
+    return df
+
+
+def build_template(path, paragraphs, tables, placeholders, columns, seed=0):
+    """Crea una plantilla .docx con el número dado de párrafos, tablas y variables"""
+    rng = random.Random(seed)
+    keys = columns[:placeholders]
+    document = Document()
+    for i in range(paragraphs):
+        key = keys[i % len(keys)]
+        if i % 3 == 0:
+            document.add_paragraph(f"Cláusula {i}: se establece {{{{{key}}}}} conforme a lo previsto.")
+        else:
+            document.add_paragraph("Texto fijo de la cláusula " + "lorem ipsum " * rng.randint(5, 30))
+    for t in range(tables):
+        table = document.add_table(rows=4, cols=3)
+        for r, row in enumerate(table.rows):
+            for c, cell in enumerate(row.cells):
+                cell.text = f"{{{{{keys[(t + r + c) % len(keys)]}}}}}" if (r + c) % 2 else "Concepto"
+    section = document.sections[0]
+    section.header.paragraphs[0].text = "Contrato {{NO_CONTRATO}}"
+    section.footer.paragraphs[0].text = "Generado {{FECHA_GENERACION}}"
+    document.save(path)
+
+
+# ---------------------------------------------------------------------------
+# Medición
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(operation, size, func, repeat, results, setup=None):
+    """Ejecuta func repeat veces y agrega sus estadísticas a results"""
+    reset_peak_rss()
+    latencies = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    total = sum(latencies)
+    result = {
+        'operation': operation,
+        'size': size,
+        'n': repeat,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p90_ms': percentile(latencies, 0.90) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': total / repeat * 1000,
+        'ops_per_sec': repeat / total if total else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    results.append(result)
+    print(f"{operation:<38} {str(size):>8} n={repeat:<4} "
+          f"p50={result['p50_ms']:9.2f} ms  p99={result['p99_ms']:9.2f} ms  "
+          f"{result['ops_per_sec'] or 0:9.1f}/s  rss={result['peak_rss_mb'] or 0:7.1f} MB")
+    return result
+
+
+def bench_data(contract_type, size, repeat, results):
+    """Operaciones de DataManager sobre un libro de `size` filas"""
+    build_workbook(contract_type, size)
+    dm = DataManager(contract_type, backend='excel')
+    label = f"{contract_type}:{size}"
+    columns = get_columns(contract_type)
+    rng = random.Random(1)
+
+    measure('load_data (frío)', label, dm.load_data, max(1, repeat // 5), results,
+            setup=dm.storage.invalidate_cache)
+    measure('load_data (caché)', label, dm.load_data, repeat * 10, results)
+    measure('get_pending_records', label, dm.get_pending_records, repeat, results)
+    supplier_query = RecordFilter(status=PENDING, supplier='a', date_from=date.today())
+    measure('query_records (filtro)', label, lambda: dm.query_records(supplier_query, ['ID', 'NO_CONTRATO']),
+            repeat, results)
+    pending = dm.get_pending_records()
+    measure('format_records', label, lambda: format_records(pending), max(1, repeat // 5), results)
+
+    def save():
+        record = synthetic_record(columns, rng.randint(0, 10 ** 6), rng)
+        record.pop('ID')
+        success, message = dm.save_record(record)
+        if not success:
+            raise RuntimeError(message)
+    measure('save_record', label, save, repeat, results)
+
+    ids = list(dm.get_pending_records()['ID'])
+    measure('mark_as_generated', label, lambda: dm.mark_as_generated(ids.pop()),
+            max(1, repeat // 5), results)
+    measure('mark_many_as_generated (100)', label,
+            lambda: dm.mark_many_as_generated(ids[-100:]), 1, results)
+
+
+def bench_templates(contract_type, documents, results):
+    """Generación de documentos con plantillas de distinto tamaño"""
+    columns = get_columns(contract_type)
+    user_fields = get_user_fields(contract_type)
+    rng = random.Random(2)
+    records = [synthetic_record(columns, i, rng) for i in range(documents)]
+
+    for name, paragraphs, tables, placeholders in TEMPLATE_SHAPES:
+        path = f"plantilla_{contract_type}_{name}.docx"
+        build_template(path, paragraphs, tables, placeholders, columns)
+        label = f"{contract_type}:{name}"
+        rows = iter(records * 2)
+
+        def legacy():
+            document = Document(path)
+            replace_template_content(document, build_replacements(next(rows), user_fields))
+            document.save(io.BytesIO())
+        measure('replace_template_content + save', label, legacy, max(1, documents // 5), results)
+
+        for fast in (False, True):
+            template = compile_template(path, fast=fast)
+            rows = iter(records * 2)
+            measure(
+                f"render {'rápido' if fast else 'compilado'}", label,
+                lambda: template.render(build_replacements(next(rows), user_fields), io.BytesIO()),
+                documents, results
+            )
+
+
+def bench_generation(contract_type, documents, workers, results):
+    """Corrida completa: pendientes, documentos en disco y estado guardado"""
+    from generator import run_generation
+
+    build_workbook(contract_type, documents)
+    path = f"plantilla_{contract_type}_media.docx"
+    if not os.path.exists(path):
+        _, paragraphs, tables, placeholders = TEMPLATE_SHAPES[1]
+        build_template(path, paragraphs, tables, placeholders, get_columns(contract_type))
+
+    for fast, stream in ((False, False), (True, False), (True, True)):
+        build_workbook(contract_type, documents)
+        output_dir = f"salida_{contract_type}_{int(fast)}{int(stream)}"
+        shutil.rmtree(output_dir, ignore_errors=True)
+        dm = DataManager(contract_type, backend='excel')
+        summary = None
+
+        def run():
+            nonlocal summary
+            summary = run_generation(dm, path, output_dir, get_user_fields(contract_type),
+                                     fast=fast, workers=workers, stream=stream)
+        mode = ('rápido' if fast else 'compilado') + (', por bloques' if stream else '')
+        result = measure(f"generate_all_documents ({mode})",
+                         f"{contract_type}:{documents}", run, 1, results)
+        result['docs_per_sec'] = summary.rate
+        result['failed'] = len(summary.failed)
+        print(f"{'':<38} {'':>8} {summary.rate:9.1f} docs/s, fallidos={len(summary.failed)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de generación y manejo de datos")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Filas de los libros sintéticos")
+    parser.add_argument('--tipos', nargs='+', choices=CONTRACT_TYPES, default=CONTRACT_TYPES)
+    parser.add_argument('--repeticiones', type=int, default=20, help="Repeticiones por operación de datos")
+    parser.add_argument('--documentos', type=int, default=50, help="Documentos por plantilla y corrida")
+    parser.add_argument('--procesos', type=int, default=1, help="Procesos en la corrida completa")
+    parser.add_argument('--salida', help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.salida or f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    results = []
+    original_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='bench_contratos_')
+    os.chdir(work_dir)
+    try:
+        for contract_type in args.tipos:
+            for size in args.tamanos:
+                bench_data(contract_type, size, args.repeticiones, results)
+            bench_templates(contract_type, args.documentos, results)
+            bench_generation(contract_type, args.documentos, args.procesos, results)
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'argumentos': vars(args),
+        },
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# cli.py
+"""
+Generación masiva de contratos sin interfaz gráfica, para tareas
+programadas o el servidor de documentos.
+
+    python cli.py servicios --plantilla plantillas_word/servicios/contrato.docx
+    python cli.py adquisiciones --plantilla p.docx --procesos 8 --filtro NO_CONTRATO=ACM-01
+    python cli.py servicios --plantilla p.docx --desde 2025-01-01 --hasta 2025-03-31 --proveedor acme
+    python cli.py servicios --plantilla plantillas_word/servicios   (todas las plantillas de la carpeta)
+
+Usa los archivos de datos del directorio actual, igual que main_app.py.
+pandas y python-docx se importan solo al generar, para que el arranque
+(y --help) sea inmediato; tkinter no se importa nunca.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+
+def parse_filters(values):
+    """Convierte ['CAMPO=VALOR', ...] en un diccionario"""
+    filters = {}
+    for value in values:
+        field, sep, expected = value.partition('=')
+        if not sep or not field:
+            raise argparse.ArgumentTypeError(f"Filtro inválido: {value} (use CAMPO=VALOR)")
+        filters[field.strip()] = expected.strip()
+    return filters
+
+
+def parse_day(value):
+    """Fecha AAAA-MM-DD de --desde / --hasta"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Fecha inválida: {value} (use AAAA-MM-DD)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Genera los contratos pendientes sin interfaz gráfica")
+    parser.add_argument('tipo', choices=['adquisiciones', 'servicios'], help="Tipo de contrato")
+    parser.add_argument('--plantilla', action='append', required=True,
+                        help="Plantilla .docx o carpeta con plantillas; se puede repetir")
+    parser.add_argument('--salida', default='contratos_generados', help="Carpeta de salida")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                        help="Procesos en paralelo (1 = en el proceso actual)")
+    parser.add_argument('--filtro', action='append', default=[], metavar='CAMPO=VALOR',
+                        help="Solo registros con ese valor; se puede repetir")
+    parser.add_argument('--desde', type=parse_day, metavar='AAAA-MM-DD',
+                        help="Solo registros capturados desde esa fecha")
+    parser.add_argument('--hasta', type=parse_day, metavar='AAAA-MM-DD',
+                        help="Solo registros capturados hasta esa fecha (incluida)")
+    parser.add_argument('--contrato', help="Solo números de contrato que contengan este texto")
+    parser.add_argument('--proveedor', help="Solo proveedores que contengan este texto")
+    parser.add_argument('--rfc', help="Solo RFC que contengan este texto")
+    parser.add_argument('--rapido', action='store_true', help="Modo rápido (solo texto)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Revisar también los ya generados y rehacer solo los que cambiaron")
+    parser.add_argument('--por-bloques', action='store_true',
+                        help="Leer y generar por bloques con memoria acotada (lotes muy grandes)")
+    parser.add_argument('--backend', choices=['excel', 'sqlite'], help="Almacenamiento de los registros")
+    parser.add_argument('--zip', action='store_true',
+                        help="Escribir los documentos en archivos ZIP con manifest.csv, sin archivos sueltos")
+    parser.add_argument('--zip-max-mb', type=float, metavar='MB',
+                        help="Tamaño máximo de cada ZIP; al llegar se abre el siguiente")
+    parser.add_argument('--omitir-verificacion', action='store_true',
+                        help="Generar aunque la verificación de la plantilla encuentre problemas")
+    parser.add_argument('--perfil', choices=['cpu', 'memoria'],
+                        help="Perfilar la corrida con cProfile o tracemalloc (archivo junto a la salida)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        filters = parse_filters(args.filtro)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    for path in args.plantilla:
+        if not os.path.exists(path):
+            parser.error(f"Archivo de plantilla no encontrado: {path}")
+
+    # Importaciones pesadas solo cuando se va a generar
+    from data_manager import DataManager, get_columns
+    from generator import run_generation
+    from preflight import check_templates, folder_templates
+    from schema import get_user_fields
+    from storage import RecordFilter
+
+    templates = []
+    for path in args.plantilla:
+        templates += folder_templates(path) if os.path.isdir(path) else [path]
+    if not templates:
+        parser.error("No se encontraron plantillas .docx")
+    templates = [os.path.normpath(path) for path in templates]
+
+    data_manager = DataManager(args.tipo, backend=args.backend)
+
+    # Columnas del esquema, del formulario y las que el archivo ya tiene
+    known = set(get_columns(args.tipo)) | set(get_user_fields(args.tipo)) | set(data_manager.stored_columns())
+    unknown = [field for field in filters if field not in known]
+    if unknown:
+        parser.error(f"Campo de filtro desconocido para {args.tipo}: {', '.join(unknown)}")
+
+    checks = check_templates(data_manager, templates, stream=args.por_bloques)
+    for check in checks:
+        if not check.ok or check.not_in_form:
+            print(f"{os.path.basename(check.path)}:\n{check.describe()}", file=sys.stderr)
+    if not all(check.ok for check in checks) and not args.omitir_verificacion:
+        print("Plantillas con problemas; use --omitir-verificacion para generar de todos modos",
+              file=sys.stderr)
+        return 2
+
+    def report(result):
+        if result.error:
+            print(f"ERROR {result.record_id}: {result.error}", file=sys.stderr)
+
+    summary = run_generation(
+        data_manager, templates, args.salida,
+        user_fields=get_user_fields(args.tipo), fast=args.rapido,
+        workers=max(1, args.procesos), filters=filters, incremental=args.incremental,
+        on_start=lambda total: print(f"Documentos por generar: {total}"),
+        on_result=report, profile=args.perfil, archive=args.zip,
+        max_archive_bytes=int(args.zip_max_mb * 1024 * 1024) if args.zip_max_mb else None,
+        query=RecordFilter(date_from=args.desde, date_to=args.hasta, contract_number=args.contrato,
+                           supplier=args.proveedor, rfc=args.rfc),
+        stream=args.por_bloques
+    )
+
+    print(f"Generados: {summary.generated} de {summary.total}"
+          f" | Sin cambios: {summary.skipped}"
+          f" | Fallidos: {len(summary.failed)}"
+          f" | Tiempo total: {summary.elapsed:.2f} s"
+          f" | {summary.rate:.1f} docs/s")
+    for path in summary.archives:
+        print(f"ZIP: {path}")
+    if summary.unsaved:
+        print(f"No se pudo guardar el estado de {len(summary.unsaved)} registros generados "
+              f"(se volverán a generar): {', '.join(map(str, summary.unsaved[:10]))}", file=sys.stderr)
+    if summary.total:
+        stages = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in summary.metrics['etapas'].items())
+        print(f"Etapas: {stages}")
+    return 1 if summary.failed or summary.unsaved else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
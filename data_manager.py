@@ -1,87 +1,150 @@
 # data_manager.py
 import pandas as pd
+import math
 import os
 import sys
 from datetime import datetime
+from storage import PENDING, QUERY_CHUNK_SIZE, ExcelStorage, RecordFilter, SQLiteStorage
+from locking import FileLock
+from schema import FORM_ORDER
+
+# Columnas base comunes
+BASE_COLUMNS = ['ID', 'FECHA_REGISTRO', 'GENERADO', 'NO_CONTRATO', 'PROVEEDOR', 'RFC']
+
+# Columnas propias de cada tipo de contrato: los campos de su formulario
+CONTRACT_COLUMNS = {contract_type: list(fields) for contract_type, fields in FORM_ORDER.items()}
+
+# Implementaciones de almacenamiento disponibles
+STORAGE_BACKENDS = {
+    'excel': ('xlsx', ExcelStorage),
+    'sqlite': ('db', SQLiteStorage)
+}
+
+# Reglas de validación de registros
+REQUIRED_FIELDS = ['NO_CONTRATO', 'PROVEEDOR', 'RFC', 'MONTO_AUTORIZADO']
+EMAIL_FIELDS = ['CORREO', 'CORREO_1', 'CORREO_2']
+
+
+def get_columns(contract_type):
+    """Columnas del registro para un tipo de contrato, sin repetidos"""
+    specific_columns = CONTRACT_COLUMNS.get(contract_type, CONTRACT_COLUMNS['servicios'])
+    return list(dict.fromkeys(BASE_COLUMNS + specific_columns))
+
+
+def validate_records(df):
+    """
+    Aplica a todas las filas a la vez las mismas reglas que save_record
+    Args:
+        df (DataFrame): Registros a validar
+    Returns:
+        pd.Series: Errores de cada fila separados por "; " ('' si es válida)
+    """
+    fields = REQUIRED_FIELDS + EMAIL_FIELDS
+    text = df.reindex(columns=fields).fillna('').astype(str).apply(lambda column: column.str.strip())
+    checks = [(text[field] == '', f"Campo obligatorio faltante: {field}") for field in REQUIRED_FIELDS]
+
+    # Validar formato numérico
+    amount = text['MONTO_AUTORIZADO']
+    numbers = pd.to_numeric(amount, errors='coerce')
+    checks.append((
+        (amount != '') & (numbers.isna() | numbers.isin([float('inf'), float('-inf')])),
+        "MONTO_AUTORIZADO debe ser numérico"
+    ))
+
+    # Validar formato de correos
+    for field in EMAIL_FIELDS:
+        email = text[field]
+        domain = email.str.split('@').str[-1]
+        invalid = (email != '') & (
+            ~email.str.contains('@', regex=False) | ~domain.str.contains('.', regex=False)
+        )
+        checks.append((invalid, f"Formato inválido en {field}"))
+
+    errors = pd.Series('', index=df.index)
+    for mask, message in checks:
+        errors = errors + mask.map({True: f"{message}; ", False: ''})
+    return errors.str.rstrip('; ')
+
+
+class IdAllocator:
+    """
+    Asigna IDs únicos y crecientes, compartidos entre procesos.
+
+    Cada ID es la marca de tiempo en milisegundos (AAAAMMDDhhmmssmmm) o, si
+    ya se usó, el entero siguiente al último asignado. El último ID se guarda
+    en un archivo de secuencia protegido por un candado, de modo que un
+    bloque de cualquier tamaño cuesta una sola lectura y escritura.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = FileLock(path + '.lock')
+
+    def allocate(self, count=1):
+        """
+        Reserva un bloque de IDs consecutivos
+        Returns:
+            list: IDs en texto
+        """
+        with self.lock:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    last = int(f.read().strip() or 0)
+            except FileNotFoundError:
+                last = 0
+            stamp = int(datetime.now().strftime("%Y%m%d%H%M%S%f")[:17])
+            start = max(stamp, last + 1)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(str(start + count - 1))
+            os.replace(temp_path, self.path)
+        return [str(start + i) for i in range(count)]
+
 
 class DataManager:
-    def __init__(self, contract_type='adquisiciones'):
+    """
+    Registros de un tipo de contrato.
+
+    Varias estaciones y procesos pueden usar los mismos archivos a la vez:
+    las escrituras se coordinan con candados de archivo en el almacenamiento
+    (ver storage.ExcelStorage) y los IDs con IdAllocator; las lecturas no
+    esperan a los escritores.
+    """
+
+    def __init__(self, contract_type='adquisiciones', backend=None):
         self.contract_type = contract_type
+        # El almacenamiento se elige por parámetro o con CONTRATOS_BACKEND (excel/sqlite)
+        self.backend = backend or os.environ.get('CONTRATOS_BACKEND', 'excel')
         
         if getattr(sys, 'frozen', False): 
             self.base_dir = os.path.dirname(sys.executable)
         else:
             self.base_dir = os.getcwd()
             
-        self.excel_file = os.path.join(self.base_dir, f"contratos_{self.contract_type}.xlsx")
+        self.open_storage()
         self.initialize_database()
 
     def switch_contract_type(self, new_type):
         """Cambia el tipo de contrato y actualiza la ruta del Excel"""
         self.contract_type = new_type
-        self.excel_file = os.path.join(self.base_dir, f"contratos_{self.contract_type}.xlsx")
+        self.open_storage()
         self.initialize_database()
 
+    def open_storage(self):
+        """Crea el almacenamiento del tipo de contrato actual"""
+        extension, storage_class = STORAGE_BACKENDS[self.backend]
+        self.excel_file = os.path.join(self.base_dir, f"contratos_{self.contract_type}.xlsx")
+        path = os.path.join(self.base_dir, f"contratos_{self.contract_type}.{extension}")
+        self.storage = storage_class(path, get_columns(self.contract_type))
+        self.id_allocator = IdAllocator(os.path.join(self.base_dir, f"contratos_{self.contract_type}.seq"))
+
     def initialize_database(self):
-        """Crea el archivo Excel con estructura inicial si no existe"""
-        if not os.path.exists(self.excel_file):
-            # Columnas base comunes
-            columns = ['ID', 'FECHA_REGISTRO', 'GENERADO', 'NO_CONTRATO', 'PROVEEDOR', 'RFC']
-            if self.contract_type == 'adquisiciones':
-                specific_columns = [
-                    'ID', 'FECHA_REGISTRO', 'GENERADO',
-                    'NO_CONTRATO',
-                    'BIENES', 'TITULAR_AREA_REQUIRENTE', 
-                    'TITULAR_AREA', 'PROVEEDOR', 'NOM_PROVEEDOR',
-                    'CARGO_PROVEEDOR', 'CARGO_AREA_REQUIRENTE',
-                    'NO_REQUISICION','FECHA_CELEBRACIÓN','FUNDAMENTO'
-                    'FECHA_NOMBRAMIENTO', 'TIPO_ADQUISICION',
-                    'ADQUISICION', 'NECESIDADES', 'PARTIDA_DENOMINACION',
-                    'NO_OFICIO', 'NO_ESCRITURA_PUBLICA', 
-                    'FECHA_PUBLICACION', 'TITULAR_NOTARIA', 
-                    'NO_NOTARIA','DIA', 'NO_MERCANTIL', 'ENTIDAD_FEDERATIVA',
-                    'OBJETO_SOCIAL', 'PERSONA_FISICA', 
-                    'CARACTER_PERSONA_FISICA', 'IDENTIFICACION', 
-                    'NO_DOCUMENTO', 'INSTITUCION', 'FOLIO_REGISTRO_PROVEEDOR',
-                    'NO_ESCRITURA', 'FECHA_PUBLICACION2', 
-                    'INE_NOTARIO', 'RFC', 'NO_CONSTANCIA',
-                    'FECHA_EXPEDICION', 'ANEXOS', 'CONSTANCIAS', 
-                    'DOMICILIO', 'NUMERO', 'COLONIA', 'ALCALDIA', 
-                    'CP', 'TELEFONOS', 'CORREO', 'CALLE', 'NO_EXT',
-                    'DESCRIPCION_ADQUISICION', 'NO_REQUERIMIENTO', 
-                    'PARTIDA_PRESUPUESTAL', 'MONTO_AUTORIZADO', 
-                    'CORREO_1', 'CORREO_2', 'FECHA_ENTREGA', 
-                    'FECHA_VIGENCIA_ENTREGA', 'VIGENCIA_CONTRATO', 
-                    'NO_PAG', 'DIAS', 'MES', 'DIA_FIRMA', 'MES_FIRMA',
-                    'DIRECCION_DE'
-                ]
-            else: #servicios
-                specific_columns = [
-                'SERVICIOS', 'TITULAR_AREA_REQUIRENTE', 'TITULAR_AREA',
-                'NOM_PROVEEDOR','CARGO_PROVEEDOR', 'CARGO_AREA_REQUIRENTE',
-                'FECHA_NOMBRAMIENTO', 'TIPO_ADQUISICION', 'DESCRIPCION_ADQUISICION', 
-                'NO_REQUERIMIENTO', 'NECESIDADES', 'PARTIDA_DENOMINACION', 
-                'NO_OFICIO', 'FECHA_NOMBRAMIENTO', 
-                'NO_ESCRITURA_PUBLICA', 'FECHA_ESCRITURA_PUBLICA', 'TITULAR_NOTARIA', 
-                'NO_NOTARIA', 'NO_MERCANTIL', 'ENTIDAD_FEDERATIVA', 
-                'INE_NOTARIA', 'DIA', 'OBJETO_SOCIAL', 'PERSONA_FISICA',
-                'CARGO_PERSONA_FISICA','CARGO_REPRESENTANTE', 'IDENTIFICACION', 'NO_DOCUMENTO', 
-                'INSTITUTO', 'SEÑALAR_RELACION_CON', 'NACIONALIDAD', 
-                'NO_INE', 'EXTRANJERO','IDENTIFICACION2', 
-                'DENOMINACION', 'OBJ_SOCIAL', 'FOLIO', 'NO_CONSTANCIA', 
-                'FECHA_CONSTANCIA', 'ANEXOS', 'CONSTANCIAS', 
-                'DOMICILIO', 'ALCALDIA', 'CP', 'TELEFONOS', 
-                'CORREO', 'CALLE', 'NO_EXT', 'DOMICILIO_CONTRATANTE', 
-                'SERVICIO_PROVEEDOR', 'NO_SERV','PARTIDA_PRESUPUESTAL',
-                'MONTO_AUTORIZADO', 'CORREO_1', 'CORREO_2', 'NOM_COORDINADOR',
-                'FECHA_ENTREGA', 'FECHA_TERMINO', 'FECHA_FIRMA', 
-                'NO_PAG', 'FECHA_CELEBRACION','DIRECCION_DE'
-                ]
-                pd.DataFrame(columns=columns + specific_columns).to_excel(self.excel_file, index=False, engine='openpyxl')
+        """Crea el archivo con estructura inicial si no existe"""
+        self.storage.initialize()
     
     def load_data(self):
-        """Carga todos los registros del Excel"""
-        return pd.read_excel(self.excel_file, engine='openpyxl')
+        """Carga todos los registros"""
+        return self.storage.load()
     
     def save_record(self, data):
         """
@@ -93,12 +156,7 @@ class DataManager:
         """
         try:
             # Validar campos obligatorios
-            required_fields = [
-                'NO_CONTRATO', 'PROVEEDOR', 
-                'RFC', 'MONTO_AUTORIZADO'
-            ]
-            
-            for field in required_fields:
+            for field in REQUIRED_FIELDS:
                 if not data.get(field):
                     return False, f"Campo obligatorio faltante: {field}"
             
@@ -107,59 +165,152 @@ class DataManager:
                 return False, "MONTO_AUTORIZADO debe ser numérico"
             
             # Validar formato de correos
-            email_fields = ['CORREO', 'CORREO_1', 'CORREO_2']
-            for email_field in email_fields:
+            for email_field in EMAIL_FIELDS:
                 if data.get(email_field):
                     if '@' not in data[email_field] or '.' not in data[email_field].split('@')[-1]:
                         return False, f"Formato inválido en {email_field}"
             
             # Generar datos automáticos
             auto_fields = {
-                'ID': datetime.now().strftime("%Y%m%d%H%M%S"),
+                'ID': self.allocate_ids(1)[0],
                 'FECHA_REGISTRO': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 'GENERADO': 'No'
             }
             data.update(auto_fields)
             
-            # Cargar y actualizar datos
-            df = self.load_data()
-            new_df = pd.DataFrame([data])
-            updated_df = pd.concat([df, new_df], ignore_index=True)
-            updated_df.to_excel(self.excel_file, index=False)
+            # Agregar al almacenamiento
+            self.storage.append([data])
             
             return True, "Contrato guardado exitosamente"
             
+        except TimeoutError:
+            return False, "El archivo de contratos está ocupado por otra estación; intente de nuevo"
         except Exception as e:
             return False, f"Error al guardar: {str(e)}"
     
-    def get_pending_records(self):
+    def import_records(self, path):
+        """
+        Importa registros desde un CSV o Excel validando todas las filas a la vez
+        Args:
+            path (str): Archivo .csv, .xlsx o .xls con una columna por campo
+        Returns:
+            tuple: (importados: int, errores: DataFrame con FILA, NO_CONTRATO y ERROR)
+        """
+        if path.lower().endswith('.csv'):
+            df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        else:
+            df = pd.read_excel(path, dtype=str, keep_default_na=False)
+        df = df.apply(lambda column: column.str.strip())
+
+        errors = validate_records(df)
+        invalid = errors != ''
+        report = pd.DataFrame({
+            # Número de fila como se ve en el archivo (la 1 es el encabezado)
+            'FILA': df.index[invalid] + 2,
+            'NO_CONTRATO': df.get('NO_CONTRATO', pd.Series('', index=df.index))[invalid].values,
+            'ERROR': errors[invalid].values
+        })
+
+        valid = df[~invalid].copy()
+        if len(valid):
+            # Generar datos automáticos
+            valid['ID'] = self.allocate_ids(len(valid))
+            valid['FECHA_REGISTRO'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            valid['GENERADO'] = 'No'
+            # Una sola escritura para todo el lote
+            self.storage.append(valid.to_dict('records'))
+        return len(valid), report
+
+    def allocate_ids(self, count=1):
+        """Reserva IDs únicos para registros nuevos (un bloque por llamada)"""
+        return self.id_allocator.allocate(count)
+
+    def query_records(self, record_filter=None, columns=None):
+        """
+        Busca registros sin cargar la tabla completa cuando el almacenamiento lo permite
+        Args:
+            record_filter (RecordFilter): Criterios; None devuelve todos
+            columns (list): Columnas del resultado; None devuelve todas
+        Returns:
+            DataFrame: Registros encontrados
+        """
+        return self.storage.query(record_filter, columns)
+
+    def iter_records(self, record_filter=None, columns=None, chunk_size=QUERY_CHUNK_SIZE):
+        """Igual que query_records(), en bloques de chunk_size registros"""
+        return self.storage.iter_query(record_filter, columns, chunk_size)
+
+    def stored_columns(self):
+        """Columnas del archivo de registros, sin cargar los registros"""
+        return self.storage.stored_columns()
+
+    def release_cache(self):
+        """Suelta la copia en memoria de los registros (se vuelve a leer al necesitarla)"""
+        self.storage.invalidate_cache()
+
+    def get_pending_records(self, columns=None):
         """Obtiene registros no generados"""
-        df = self.load_data()
-        return df[df['GENERADO'] == 'No']
+        return self.query_records(RecordFilter(status=PENDING), columns)
     
     def mark_as_generated(self, record_id):
         """Marca un registro como generado"""
+        return self.mark_many_as_generated([record_id])
+    
+    def mark_many_as_generated(self, record_ids):
+        """
+        Marca varios registros como generados con una sola escritura
+        Args:
+            record_ids (iterable): IDs de los registros generados
+        Returns:
+            bool: True si se guardó el cambio
+        """
+        ids = {str(record_id) for record_id in record_ids}
+        if not ids:
+            return True
         try:
-            df = self.load_data()
-            df.loc[df['ID'] == record_id, 'GENERADO'] = 'Sí'
-            df.to_excel(self.excel_file, index=False)
+            self.storage.mark_generated(ids)
             return True
         except Exception as e:
             print(f"Error al marcar como generado: {str(e)}")
             return False
     
     def validate_number(self, value):
-        """Valida que sea un número válido"""
+        """Valida que sea un número válido (finito: 'nan' e 'inf' no lo son)"""
         try:
-            float(value)
-            return True
+            return math.isfinite(float(value))
         except (ValueError, TypeError):
             return False
-        
-    def get_pending_records(self):
-    #Obtiene todos los registros no generados"""
+
+    def cache_stats(self):
+        """Aciertos y fallos de la caché de registros en memoria"""
+        return {'hits': self.storage.cache_hits, 'misses': self.storage.cache_misses}
+
+    def compact(self):
+        """Consolida en el archivo principal los registros guardados en el diario"""
+        self.storage.compact()
+
+    def import_from_excel(self, path=None):
+        """
+        Reemplaza los registros con el contenido de un Excel con el formato de contratos_<tipo>.xlsx
+        Returns:
+            int: Registros importados
+        """
+        # Se lee como ExcelStorage: con los registros de su diario y los IDs como texto
+        df = ExcelStorage(path or self.excel_file, self.storage.columns).load()
+        self.storage.replace(df)
+        return len(df)
+
+    def export_to_excel(self, path=None):
+        """
+        Escribe todos los registros en un Excel con el formato de contratos_<tipo>.xlsx
+        Returns:
+            int: Registros exportados
+        """
         df = self.load_data()
-        return df[df['GENERADO'] == 'No']
+        # Con el candado del libro, y descartando el diario que tuviera: si no,
+        # sus registros volverían a aparecer junto a los exportados
+        ExcelStorage(path or self.excel_file, self.storage.columns).replace(df)
+        return len(df)
     
 if __name__ == "__main__":
     # Prueba de funcionalidad
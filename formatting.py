@@ -0,0 +1,250 @@
+# formatting.py
+"""
+Formato de los valores de los registros antes de generar los documentos.
+
+format_records() convierte de una vez todo el DataFrame de pendientes en
+texto listo para la plantilla: montos, importe con letra, fechas en
+español y vacíos ('' en lugar de "nan"). La generación solo consulta esos
+textos por fila.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Formato de cada columna: 'moneda', 'numero' o 'fecha'; el resto se pasa a texto
+COLUMN_FORMATS = {
+    'MONTO_AUTORIZADO': 'moneda',
+    'FECHA_NOMBRAMIENTO': 'fecha',
+    'FECHA_CELEBRACION': 'fecha',
+    'FECHA_CELEBRACIÓN': 'fecha',
+    'FECHA_PUBLICACION': 'fecha',
+    'FECHA_PUBLICACION2': 'fecha',
+    'FECHA_ESCRITURA_PUBLICA': 'fecha',
+    'FECHA_EXPEDICION': 'fecha',
+    'FECHA_CONSTANCIA': 'fecha',
+    'FECHA_ENTREGA': 'fecha',
+    'FECHA_VIGENCIA_ENTREGA': 'fecha',
+    'FECHA_TERMINO': 'fecha',
+    'FECHA_FIRMA': 'fecha',
+}
+
+# Columnas calculadas a partir de otra: {columna nueva: (formato, columna origen)}
+DERIVED_COLUMNS = {
+    'MONTO_LETRA': ('letra', 'MONTO_AUTORIZADO'),
+}
+
+MONTHS = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio',
+          'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre']
+
+_UNITS = [
+    '', 'UN', 'DOS', 'TRES', 'CUATRO', 'CINCO', 'SEIS', 'SIETE', 'OCHO', 'NUEVE',
+    'DIEZ', 'ONCE', 'DOCE', 'TRECE', 'CATORCE', 'QUINCE', 'DIECISÉIS', 'DIECISIETE',
+    'DIECIOCHO', 'DIECINUEVE', 'VEINTE', 'VEINTIÚN', 'VEINTIDÓS', 'VEINTITRÉS',
+    'VEINTICUATRO', 'VEINTICINCO', 'VEINTISÉIS', 'VEINTISIETE', 'VEINTIOCHO', 'VEINTINUEVE'
+]
+_TENS = ['', '', '', 'TREINTA', 'CUARENTA', 'CINCUENTA', 'SESENTA', 'SETENTA', 'OCHENTA', 'NOVENTA']
+_HUNDREDS = ['', 'CIENTO', 'DOSCIENTOS', 'TRESCIENTOS', 'CUATROCIENTOS', 'QUINIENTOS',
+             'SEISCIENTOS', 'SETECIENTOS', 'OCHOCIENTOS', 'NOVECIENTOS']
+
+
+def _hundreds_to_words(n):
+    """Número de 1 a 999 con letra (con "UN" en lugar de "UNO")"""
+    if n == 100:
+        return 'CIEN'
+    hundreds, rest = divmod(n, 100)
+    words = [_HUNDREDS[hundreds]] if hundreds else []
+    if rest >= 30:
+        tens, units = divmod(rest, 10)
+        words.append(_TENS[tens] + (f' Y {_UNITS[units]}' if units else ''))
+    elif rest:
+        words.append(_UNITS[rest])
+    return ' '.join(words)
+
+
+@lru_cache(maxsize=None)
+def number_to_words(n):
+    """Entero con letra, en mayúsculas: 1501 -> "MIL QUINIENTOS UN", -5 -> "MENOS CINCO" """
+    if n < 0:
+        return f'MENOS {number_to_words(-n)}'
+    if n == 0:
+        return 'CERO'
+    if n >= 10 ** 12:
+        billions, rest = divmod(n, 10 ** 12)
+        words = 'UN BILLÓN' if billions == 1 else f'{number_to_words(billions)} BILLONES'
+        return f'{words} {number_to_words(rest)}' if rest else words
+    millions, rest = divmod(n, 1000000)
+    thousands, units = divmod(rest, 1000)
+    words = []
+    if millions:
+        words.append('UN MILLÓN' if millions == 1 else f'{number_to_words(millions)} MILLONES')
+    if thousands:
+        words.append('MIL' if thousands == 1 else f'{_hundreds_to_words(thousands)} MIL')
+    if units:
+        words.append(_hundreds_to_words(units))
+    return ' '.join(words)
+
+
+@lru_cache(maxsize=65536)
+def amount_in_words(cents):
+    """
+    Importe con letra a partir de centavos: 150050 -> "MIL QUINIENTOS PESOS 50/100 M.N."
+    Los montos se repiten mucho entre contratos, por eso el resultado se guarda en caché.
+    """
+    if cents < 0:
+        return f'MENOS {amount_in_words(-cents)}'
+    pesos, cents = divmod(cents, 100)
+    words = number_to_words(pesos)
+    if pesos == 1:
+        currency = 'PESO'
+    elif pesos and pesos % 1000000 == 0:
+        currency = 'DE PESOS'
+    else:
+        currency = 'PESOS'
+    return f'{words} {currency} {cents:02d}/100 M.N.'
+
+
+def _map_unique(series, func):
+    """Aplica func una vez por valor distinto de la columna"""
+    uniques = series.dropna().unique()
+    return series.map(dict(zip(uniques, map(func, uniques))))
+
+
+def _plain_text(value):
+    """Texto de un valor sin formato especial"""
+    if isinstance(value, float) and value.is_integer():
+        # Números leídos de Excel como float: 12345.0 -> "12345"
+        return str(int(value))
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%d/%m/%Y') if value == value.normalize() else value.strftime('%d/%m/%Y %H:%M')
+    return str(value)
+
+
+def _amounts(series):
+    """Montos como float; lo que no es un número finito queda como NaN"""
+    amounts = pd.to_numeric(series.astype(str).str.replace(r'[$,\s]', '', regex=True), errors='coerce')
+    return amounts.where(np.isfinite(amounts))
+
+
+def _currency(amount):
+    return f'-${-amount:,.2f}' if amount < 0 else f'${amount:,.2f}'
+
+
+def format_currency(series):
+    """Montos como $1,500.50 (negativos como -$1,500.50); lo que no es número se deja como texto"""
+    amounts = _amounts(series)
+    formatted = _map_unique(amounts, _currency)
+    return formatted.where(amounts.notna(), _text(series))
+
+
+def format_number(series):
+    """Números con separador de miles y dos decimales: 1,500.50"""
+    amounts = _amounts(series)
+    formatted = _map_unique(amounts, '{:,.2f}'.format)
+    return formatted.where(amounts.notna(), _text(series))
+
+
+def format_amount_words(series):
+    """Importe con letra de una columna de montos; vacío si no es un número finito"""
+    cents = (_amounts(series) * 100).round()
+    words = _map_unique(cents, lambda value: amount_in_words(int(value)))
+    return words.where(cents.notna(), '')
+
+
+def format_date(series):
+    """
+    Fechas como "15 de marzo de 2025". Se reconocen AAAA-MM-DD (también
+    las fechas de Excel) y DD/MM/AAAA; el resto se deja como texto.
+    """
+    text = series.astype(str).str.strip()
+    iso = text.str.extract(r'^(\d{4})-(\d{1,2})-(\d{1,2})(?:$|[ T])')
+    local = text.str.extract(r'^(\d{1,2})[/-](\d{1,2})[/-](\d{4})(?:$|\s)')
+    parts = pd.DataFrame({
+        'year': pd.to_numeric(iso[0].fillna(local[2])),
+        'month': pd.to_numeric(iso[1].fillna(local[1])),
+        'day': pd.to_numeric(iso[2].fillna(local[0])),
+    })
+    dates = pd.to_datetime(parts, errors='coerce')
+    valid = dates.notna()
+    formatted = pd.Series('', index=series.index, dtype=object)
+    formatted[valid] = (
+        dates[valid].dt.day.astype(str) + ' de '
+        + dates[valid].dt.month.map(lambda month: MONTHS[month - 1]) + ' de '
+        + dates[valid].dt.year.astype(str)
+    )
+    return formatted.where(valid, _text(series))
+
+
+def _text(series):
+    # Columnas que ya son solo texto: basta con vaciar los nulos
+    if pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series.astype(object).where(series.notna(), '')
+    return _map_unique(series, _plain_text).fillna('')
+
+
+def _on_uniques(series, formatter, failures=None):
+    """
+    Aplica un formateador solo a los valores distintos de la columna y
+    reparte el resultado; los nulos quedan como ''.
+    Con failures, si el formateador falla se repite valor por valor: los
+    que fallan quedan como '' y su error se guarda en failures por fila.
+    """
+    codes, uniques = pd.factorize(series)
+    if not len(uniques):
+        return pd.Series('', index=series.index, dtype=object)
+    try:
+        formatted = formatter(pd.Series(uniques)).to_numpy(dtype=object)
+    except Exception:
+        if failures is None:
+            raise
+        formatted = np.empty(len(uniques), dtype=object)
+        for position, value in enumerate(uniques):
+            try:
+                formatted[position] = formatter(pd.Series([value])).iloc[0]
+            except Exception as e:
+                formatted[position] = ''
+                for row in series.index[codes == position]:
+                    failures.setdefault(row, str(e) or type(e).__name__)
+    return pd.Series(np.where(codes >= 0, formatted[codes], ''), index=series.index, dtype=object)
+
+
+FORMATTERS = {
+    'moneda': format_currency,
+    'numero': format_number,
+    'letra': format_amount_words,
+    'fecha': format_date,
+}
+
+
+def format_records(df, formats=None, derived=None, errors=None):
+    """
+    Convierte todas las columnas a texto listo para la plantilla
+    Args:
+        df (DataFrame): Registros
+        formats (dict): Formato por columna (por defecto COLUMN_FORMATS)
+        derived (dict): Columnas calculadas (por defecto DERIVED_COLUMNS)
+        errors (dict): Si se da, un valor que no se puede formatear no detiene
+            el resto: recibe {índice de la fila: mensaje} y el valor queda vacío
+    Returns:
+        DataFrame: Mismas filas, con valores de texto y las columnas calculadas
+    """
+    formats = COLUMN_FORMATS if formats is None else formats
+    derived = DERIVED_COLUMNS if derived is None else derived
+    result = {}
+
+    def apply(column, source, formatter):
+        failures = None if errors is None else {}
+        result[column] = _on_uniques(df[source], formatter, failures)
+        for row, message in (failures or {}).items():
+            errors.setdefault(row, f"No se pudo dar formato a {column}: {message}")
+
+    for column in df.columns:
+        formatter = FORMATTERS.get(formats.get(column))
+        if formatter:
+            apply(column, column, formatter)
+        else:
+            result[column] = _text(df[column])
+    for column, (name, source) in derived.items():
+        if source in df.columns:
+            apply(column, source, FORMATTERS[name])
+    return pd.DataFrame(result, index=df.index)
@@ -0,0 +1,715 @@
+# generator.py
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from itertools import chain, islice, repeat
+from typing import NamedTuple
+
+from archive import ArchiveWriter
+from formatting import COLUMN_FORMATS, DERIVED_COLUMNS, MONTHS, format_records
+from manifest import RunManifest, file_hash, row_hash, settings_hash
+from metrics import PipelineMetrics, log_metrics, profiled
+from storage import PENDING, RecordFilter
+from template_engine import compile_template
+
+# Registros enviados a cada proceso en una sola tarea
+CHUNK_SIZE = 25
+
+# Máximo de procesos: en Windows ProcessPoolExecutor no acepta más de 61
+MAX_WORKERS = 61
+
+# Bloques pendientes por proceso: acota la memoria de los lotes grandes
+IN_FLIGHT_PER_WORKER = 2
+
+# Registros leídos y formateados a la vez en la generación por bloques
+STREAM_CHUNK_SIZE = 500
+
+# Registros generados entre cada escritura del estado en el Excel
+CHECKPOINT_EVERY = 200
+
+# Variables que calcula la generación y no vienen de los registros
+GENERATED_FIELDS = ('FECHA_GENERACION',) + tuple(DERIVED_COLUMNS)
+
+# Estado de cada proceso de generación, cargado una vez por el inicializador
+_worker_state = {}
+
+
+class GenerationResult(NamedTuple):
+    """Resultado de generar el documento de un registro"""
+    record_id: object
+    filename: str
+    error: str = None
+    # El documento ya existía con las mismas entradas y no se volvió a generar
+    skipped: bool = False
+    # Segundos de render y guardado, bytes escritos y variables reemplazadas
+    elapsed: float = 0.0
+    size: int = 0
+    replaced: int = 0
+    # Contenido del documento cuando se genera en memoria (salida en ZIP)
+    data: bytes = None
+    # ZIP donde quedó el documento, en lugar de un archivo suelto
+    archive: str = None
+    # Posición de la plantilla en la lista de la corrida
+    template: int = 0
+
+
+class GenerationSummary(NamedTuple):
+    """Resumen de una corrida de generación; se cuentan documentos (registros × plantillas)"""
+    total: int
+    failed: list
+    elapsed: float
+    skipped: int = 0
+    # PipelineMetrics.snapshot() de la corrida
+    metrics: dict = None
+    # Documentos que realmente se procesaron; por bloques puede diferir de total,
+    # que se cuenta antes de leer los registros
+    processed: int = 0
+    # Archivos ZIP escritos, con salida en ZIP
+    archives: tuple = ()
+    # IDs de registros generados cuyo estado no se pudo guardar
+    unsaved: tuple = ()
+    cancelled: bool = False
+
+    @property
+    def generated(self):
+        return self.processed - len(self.failed) - self.skipped
+
+    @property
+    def rate(self):
+        """Documentos generados por segundo"""
+        return self.generated / self.elapsed if self.elapsed else 0.0
+
+
+def build_replacements(record, user_fields):
+    """
+    Prepara los valores de reemplazo de un registro ya formateado
+    (ver formatting.format_records)
+    """
+    replacements = dict(record)
+
+    # Agregar asterisco a los campos capturados por el usuario que tienen valor
+    for field in user_fields:
+        if replacements.get(field) not in (None, ''):
+            replacements[field] = f"*{replacements[field]}*"
+
+    # Campos adicionales dinámicos
+    replacements['FECHA_GENERACION'] = datetime.now().strftime("%d/%m/%Y %H:%M")
+    return replacements
+
+
+def output_filename(record, extension):
+    """Genera un nombre de archivo seguro a partir del número de contrato"""
+    contract_number = str(record['NO_CONTRATO']).replace('/', '_').strip()
+    return f"Contrato_{contract_number}{extension}"
+
+
+def render_record(template, record, output_dir, user_fields, in_memory=False,
+                  replacements=None, template_index=0):
+    """
+    Genera el documento de un registro y lo guarda en output_dir, o con
+    in_memory lo devuelve en GenerationResult.data sin escribir archivos.
+    replacements evita preparar otra vez los valores con cada plantilla.
+    """
+    try:
+        filename = output_filename(record, os.path.splitext(template.template_path)[1])
+        if replacements is None:
+            replacements = build_replacements(record, user_fields)
+        started = time.perf_counter()
+        if in_memory:
+            buffer = io.BytesIO()
+            replaced = template.render(replacements, buffer)
+            data = buffer.getvalue()
+            size = len(data)
+        else:
+            path = os.path.join(output_dir, filename)
+            replaced = template.render(replacements, path)
+            data = None
+            size = os.path.getsize(path)
+        return GenerationResult(
+            record.get('ID'), filename, elapsed=time.perf_counter() - started,
+            size=size, replaced=replaced, data=data, template=template_index
+        )
+    except Exception as e:
+        return GenerationResult(record.get('ID'), None, str(e), template=template_index)
+
+
+def render_row(targets, record, user_fields, indexes, in_memory=False):
+    """
+    Genera los documentos de un registro con varias plantillas, preparando
+    sus valores una sola vez
+    Args:
+        targets (list): (plantilla compilada, carpeta de salida) de cada plantilla
+        record (dict): Registro ya formateado
+        user_fields (iterable): Campos capturados por el usuario
+        indexes (iterable): Posiciones en targets de las plantillas a generar
+        in_memory (bool): Devolver los documentos en lugar de escribirlos
+    Returns:
+        list: GenerationResult, uno por plantilla
+    """
+    replacements = build_replacements(record, user_fields)
+    return [
+        render_record(targets[index][0], record, targets[index][1], user_fields,
+                      in_memory, replacements, index)
+        for index in indexes
+    ]
+
+
+def _init_worker(template_paths, fast, output_dirs, user_fields, in_memory):
+    """Compila las plantillas una sola vez por proceso"""
+    _worker_state['targets'] = [
+        (compile_template(path, fast=fast), output_dir)
+        for path, output_dir in zip(template_paths, output_dirs)
+    ]
+    _worker_state['user_fields'] = user_fields
+    _worker_state['in_memory'] = in_memory
+
+
+def _render_chunk(jobs):
+    results = []
+    for record, indexes in jobs:
+        results.extend(render_row(_worker_state['targets'], record, _worker_state['user_fields'],
+                                  indexes, _worker_state['in_memory']))
+    return results
+
+
+def _render_isolated(chunk, initargs):
+    """Repite un bloque en un proceso propio para aislar una caída"""
+    with ProcessPoolExecutor(1, initializer=_init_worker, initargs=initargs) as pool:
+        try:
+            return pool.submit(_render_chunk, chunk).result()
+        except BrokenProcessPool:
+            return [
+                GenerationResult(record.get('ID'), None,
+                                 "El proceso de generación terminó inesperadamente", template=index)
+                for record, indexes in chunk for index in indexes
+            ]
+
+
+def default_workers():
+    """Procesos por defecto: uno por CPU, sin pasar de MAX_WORKERS"""
+    return min(MAX_WORKERS, os.cpu_count() or 1)
+
+
+def _as_list(paths):
+    return [paths] if isinstance(paths, str) else list(paths)
+
+
+def generate_documents(template_path, records, output_dir, user_fields=(),
+                       fast=False, workers=1, chunk_size=CHUNK_SIZE, cancel=None,
+                       in_memory=False, selections=None):
+    """
+    Genera los documentos de cada registro, en paralelo si se piden varios procesos.
+
+    Con varias plantillas cada una se compila una sola vez (por proceso) y
+    todos los documentos de un registro se generan juntos, en una sola
+    pasada por los registros.
+
+    Si se activa cancel, termina tras el registro en curso (con varios
+    procesos, tras los bloques que ya se estaban generando, cuyos resultados
+    también se entregan; los que no habían empezado no se generan).
+    Args:
+        template_path (str | list): Ruta de la plantilla, o lista de rutas
+        records (iterable): Registros como diccionarios; se consumen a medida
+            que se generan, así que puede ser un generador
+        output_dir (str | list): Carpeta de salida, o una por plantilla
+        user_fields (iterable): Campos capturados por el usuario (se marcan con asteriscos)
+        fast (bool): Usar el modo rápido de la plantilla
+        workers (int): Número de procesos; 1 genera en el proceso actual
+        chunk_size (int): Registros por tarea enviada a cada proceso
+        cancel (threading.Event): Señal para detener la generación
+        in_memory (bool): Devolver cada documento en GenerationResult.data en lugar de escribirlo
+        selections (iterable): Por registro, posiciones de las plantillas a generar
+            (por defecto todas)
+    Yields:
+        GenerationResult: En el orden de los registros y, en cada uno, de las plantillas
+    """
+    template_paths = _as_list(template_path)
+    if selections is None:
+        selections = repeat(tuple(range(len(template_paths))))
+    return render_jobs(template_paths, zip(records, selections), output_dir, user_fields,
+                       fast, workers, chunk_size, cancel, in_memory)
+
+
+def render_jobs(template_paths, jobs, output_dir, user_fields=(), fast=False, workers=1,
+                chunk_size=CHUNK_SIZE, cancel=None, in_memory=False):
+    """
+    Igual que generate_documents(), con los trabajos como pares
+    (registro, posiciones de las plantillas). Los trabajos se leen de a poco:
+    con varios procesos hay a lo sumo IN_FLIGHT_PER_WORKER bloques por
+    proceso pendientes, así que la memoria no crece con el tamaño del lote.
+    """
+    output_dirs = _as_list(output_dir) if not isinstance(output_dir, str) else [output_dir] * len(template_paths)
+    user_fields = tuple(user_fields)
+    workers = min(workers, MAX_WORKERS)
+
+    if workers <= 1:
+        targets = [(compile_template(path, fast=fast), directory)
+                   for path, directory in zip(template_paths, output_dirs)]
+        for record, indexes in jobs:
+            if cancel and cancel.is_set():
+                return
+            yield from render_row(targets, record, user_fields, indexes, in_memory)
+        return
+
+    initargs = (template_paths, fast, output_dirs, user_fields, in_memory)
+    jobs = iter(jobs)
+    chunks = iter(lambda: list(islice(jobs, chunk_size)), [])
+    while True:
+        broken = None
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+            in_flight = deque(
+                (chunk, pool.submit(_render_chunk, chunk))
+                for chunk in islice(chunks, workers * IN_FLIGHT_PER_WORKER)
+            )
+            while in_flight:
+                if cancel and cancel.is_set():
+                    # Los bloques que no han empezado se descartan; los que ya se
+                    # están generando se esperan y se entregan, para que sus
+                    # documentos queden marcados y en el manifiesto
+                    for _, pending in in_flight:
+                        pending.cancel()
+                    for _, pending in in_flight:
+                        if not pending.cancelled():
+                            try:
+                                yield from pending.result()
+                            except BrokenProcessPool:
+                                break
+                    return
+                chunk, future = in_flight.popleft()
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    broken = chunk
+                    break
+                for next_chunk in islice(chunks, 1):
+                    in_flight.append((next_chunk, pool.submit(_render_chunk, next_chunk)))
+                yield from results
+        if broken is None:
+            return
+        # Un proceso se cayó: el bloque actual se repite aislado para que
+        # solo fallen sus propios registros, y el resto sigue en un pool nuevo
+        yield from _render_isolated(broken, initargs)
+        chunks = chain([chunk for chunk, _ in in_flight], chunks)
+
+
+def commit_generated(results, data_manager, every=CHECKPOINT_EVERY, metrics=None, per_record=1,
+                     unsaved=None, durable=None):
+    """
+    Marca como generados los registros exitosos en escrituras por lotes.
+    Un registro se marca cuando todos sus documentos terminan sin error.
+
+    Si una escritura falla (por ejemplo, el libro está abierto en Excel),
+    sus IDs se conservan y se intentan otra vez en la siguiente escritura y
+    al final; los que aun así no se guardan quedan en unsaved.
+
+    Con Excel cada escritura solo agrega una línea al diario; al final se
+    consolida una sola vez en el libro (DataManager.compact). Si no se
+    puede, las marcas siguen en el diario y se consolidan en la siguiente.
+    Args:
+        results (iterable): GenerationResult producidos por generate_documents
+        data_manager (DataManager): Almacenamiento de los registros
+        every (int): Registros acumulados antes de cada escritura intermedia
+        metrics (PipelineMetrics): Acumula el tiempo de escritura del estado
+        per_record (int): Documentos de cada registro (uno por plantilla)
+        unsaved (list): Recibe los IDs generados cuyo estado no se pudo guardar
+        durable (callable): Indica si el documento de un resultado ya está
+            guardado para siempre (con salida en ZIP, si su ZIP ya se cerró);
+            el registro se marca solo cuando lo están todos sus documentos.
+            Los registros se completan en orden, así que se revisan en cola.
+    Yields:
+        GenerationResult: Los mismos resultados, sin cambios
+    """
+    metrics = metrics or PipelineMetrics()
+    generated = []
+    # Hubo al menos una escritura: al final se consolida
+    written = False
+    # Siguiente escritura; tras un fallo se espera otro lote antes de reintentar
+    flush_at = every
+    # Documentos sin error de los registros que aún no se completan
+    completed = {}
+    # Registros completos cuyos documentos aún no son definitivos
+    waiting = deque()
+
+    def promote():
+        while waiting and all(durable(result) for result in waiting[0][1]):
+            generated.append(waiting.popleft()[0])
+
+    def flush():
+        nonlocal written
+        with metrics.stage('escritura_estado'):
+            saved = data_manager.mark_many_as_generated(generated)
+        written = written or saved
+        return saved
+
+    try:
+        for result in results:
+            if not result.error:
+                key = str(result.record_id)
+                completed.setdefault(key, []).append(result)
+                if len(completed[key]) == per_record:
+                    done = completed.pop(key)
+                    if durable is None:
+                        generated.append(result.record_id)
+                    else:
+                        waiting.append((result.record_id, done))
+                if waiting:
+                    promote()
+                if len(generated) >= flush_at:
+                    if flush():
+                        generated = []
+                        flush_at = every
+                    else:
+                        flush_at = len(generated) + every
+            yield result
+    finally:
+        # También al interrumpirse la generación, para no perder lo ya hecho;
+        # los registros cuyos documentos no llegaron a ser definitivos no se marcan
+        if waiting:
+            promote()
+        if generated and not flush():
+            metrics.count('estado_no_guardado', len(generated))
+            if unsaved is not None:
+                unsaved.extend(generated)
+        if written:
+            with metrics.stage('escritura_estado'):
+                try:
+                    data_manager.compact()
+                except Exception:
+                    # El estado ya quedó guardado en el diario
+                    metrics.count('consolidacion_pendiente')
+
+
+def archive_results(results, writers, contract_numbers):
+    """
+    Agrega a los ZIP los documentos generados en memoria
+    Args:
+        results (iterable): GenerationResult con el contenido en data
+        writers (list): ArchiveWriter de cada plantilla
+        contract_numbers (dict): NO_CONTRATO por ID en texto
+    Yields:
+        GenerationResult: Sin el contenido y con el ZIP donde quedó el documento
+    """
+    for result in results:
+        if not result.error:
+            try:
+                name = writers[result.template].add(
+                    result.filename, result.data, result.record_id,
+                    contract_numbers.get(str(result.record_id))
+                )
+                result = result._replace(archive=name)
+            except Exception as e:
+                result = result._replace(error=f"No se pudo agregar al ZIP: {e}")
+        # El contenido ya está en el ZIP: no se conserva en memoria
+        yield result._replace(data=None)
+
+
+def manifest_path(output_dir, template_path):
+    """Manifiesto de una plantilla dentro de la carpeta de salida"""
+    return os.path.join(output_dir, f"manifest_{template_name(template_path)}.json")
+
+
+def template_name(template_path):
+    """Nombre de la plantilla sin carpeta ni extensión"""
+    return os.path.splitext(os.path.basename(template_path))[0]
+
+
+def template_output_dirs(output_dir, template_paths):
+    """
+    Carpeta de salida de cada plantilla: con una sola, output_dir; con
+    varias, una subcarpeta por plantilla para que los documentos del mismo
+    contrato no se sobrescriban
+    """
+    if len(template_paths) == 1:
+        return [output_dir]
+    return [os.path.join(output_dir, template_name(path)) for path in template_paths]
+
+
+def run_generation(data_manager, template_path, output_dir, user_fields=(), fast=False,
+                   workers=1, filters=None, incremental=False, on_start=None, on_result=None,
+                   metrics=None, profile=None, cancel=None, archive=False, max_archive_bytes=None,
+                   query=None, stream=False):
+    """
+    Genera los contratos pendientes y guarda su estado por lotes.
+
+    Con varias plantillas (contrato, anexos, oficios...) se generan todos los
+    documentos de cada registro en la misma pasada, cada plantilla en su
+    subcarpeta; el registro se marca como generado cuando todos terminan bien.
+
+    El manifiesto de la carpeta de salida permite reanudar: los registros
+    cuyo documento ya existe con los mismos valores y la misma plantilla no
+    se vuelven a generar (solo se marcan como generados).
+
+    Los tiempos por etapa y los contadores de la corrida se agregan al
+    registro metricas_generacion.jsonl, junto a la carpeta de salida.
+    Args:
+        data_manager (DataManager): Origen de los registros
+        template_path (str | list): Ruta de la plantilla, o lista de rutas
+        output_dir (str): Carpeta de salida
+        user_fields (iterable): Campos capturados por el usuario
+        fast (bool): Usar el modo rápido de la plantilla
+        workers (int): Número de procesos
+        filters (dict): Solo registros cuyo campo sea igual al valor dado
+        incremental (bool): Revisar también los ya generados y rehacer los que cambiaron
+        on_start (callable): Recibe el total de registros a procesar
+        on_result (callable): Recibe cada GenerationResult
+        metrics (PipelineMetrics): Métricas a actualizar, para leerlas durante la corrida
+        profile (str): 'cpu' o 'memoria' para perfilar la corrida (ver metrics.profiled)
+        cancel (threading.Event): Señal para detener la corrida tras el documento en curso;
+            lo ya generado queda guardado y el resumen indica cuántos se procesaron
+        archive (bool): Escribir los documentos en archivos ZIP (ver ArchiveWriter)
+            en lugar de archivos sueltos
+        max_archive_bytes (int): Tamaño máximo de cada ZIP; sin límite si es None
+        query (RecordFilter): Criterios de búsqueda de los registros; sin estado,
+            se leen los pendientes (o todos con incremental)
+        stream (bool): Leer y generar por bloques de STREAM_CHUNK_SIZE registros en
+            lugar de cargar todos, para lotes muy grandes; la memoria no crece con
+            el tamaño del lote (el total se cuenta antes con una lectura de los ID)
+    Returns:
+        GenerationSummary
+    """
+    query = query or RecordFilter()
+    if query.status is None and not incremental:
+        query = query._replace(status=PENDING)
+    template_paths = _as_list(template_path)
+    metrics = metrics or PipelineMetrics()
+    with profiled(profile, output_dir):
+        summary = _run_generation(
+            data_manager, template_paths, output_dir, user_fields, fast, workers,
+            filters, query, stream, on_start, on_result, metrics, cancel,
+            archive, max_archive_bytes
+        )
+    if summary.total:
+        log_metrics(
+            metrics, output_dir, tipo=data_manager.contract_type,
+            plantilla=', '.join(os.path.basename(path) for path in template_paths), modo_rapido=fast,
+            procesos=workers, incremental=incremental, fallidos=len(summary.failed),
+            cancelada=summary.cancelled, zip=archive, por_bloques=stream
+        )
+    return summary._replace(metrics=metrics.snapshot())
+
+
+def record_columns(templates, filters=()):
+    """
+    Columnas de los registros que usa la generación: ID, NO_CONTRATO, las
+    variables de las plantillas, los orígenes de sus columnas calculadas y
+    las de los filtros
+    """
+    placeholders = set().union(*(template.placeholders for template in templates))
+    columns = ['ID', 'NO_CONTRATO']
+    columns += sorted(placeholders - set(GENERATED_FIELDS))
+    columns += [source for name, (_, source) in DERIVED_COLUMNS.items() if name in placeholders]
+    columns += list(filters)
+    return list(dict.fromkeys(columns))
+
+
+def _apply_filters(df, filters):
+    for column, value in filters.items():
+        # Un campo que el archivo aún no tiene no coincide con ningún registro
+        if column not in df.columns:
+            return df.iloc[0:0]
+        df = df[df[column].astype(str) == str(value)]
+    return df
+
+
+def _in_closed_archive(writers):
+    """Indica si el documento de un resultado ya está en un ZIP cerrado (o no va en ZIP)"""
+    closed = [writer.closed for writer in writers]
+
+    def durable(result):
+        return result.archive is None or result.archive in closed[result.template]
+    return durable
+
+
+def _timed(iterable, metrics, stage):
+    """Recorre iterable contando en la etapa dada solo el tiempo de obtener cada elemento"""
+    iterator = iter(iterable)
+    while True:
+        with metrics.stage(stage):
+            item = next(iterator, None)
+        if item is None:
+            return
+        yield item
+
+
+def _run_generation(data_manager, template_paths, output_dir, user_fields, fast, workers,
+                    filters, query, stream, on_start, on_result, metrics, cancel,
+                    archive, max_archive_bytes):
+    started = time.perf_counter()
+    filters = filters or {}
+    # Con un solo proceso estas son las mismas plantillas que usa la generación;
+    # sus variables deciden qué columnas se leen
+    with metrics.stage('plantilla'):
+        templates = [compile_template(path, fast=fast) for path in template_paths]
+    columns = record_columns(templates, filters)
+
+    with metrics.stage('lectura_datos'):
+        if stream:
+            # Los bloques se leen siempre del archivo: la copia en memoria no hace falta
+            data_manager.release_cache()
+            # Primero solo los ID, para el total; los registros se leen por bloques al generar
+            total_rows = len(_apply_filters(data_manager.query_records(query, ['ID'] + list(filters)), filters))
+            chunks = _timed(
+                (_apply_filters(chunk, filters)
+                 for chunk in data_manager.iter_records(query, columns, STREAM_CHUNK_SIZE)),
+                metrics, 'lectura_datos'
+            )
+        else:
+            df = _apply_filters(data_manager.query_records(query), filters)
+            df = df[[column for column in columns if column in df.columns]]
+            total_rows = len(df)
+            chunks = [df]
+
+    total = total_rows * len(template_paths)
+    if on_start:
+        on_start(total)
+
+    failed = []
+    skipped = 0
+    processed = 0
+    writers = []
+    unsaved = []
+    if total:
+        output_dirs = template_output_dirs(output_dir, template_paths)
+        for directory in output_dirs:
+            os.makedirs(directory, exist_ok=True)
+        metrics.count('variables_plantilla', sum(len(template.placeholders) for template in templates))
+
+        with metrics.stage('manifiesto'):
+            manifests = [RunManifest(manifest_path(directory, path))
+                         for path, directory in zip(template_paths, output_dirs)]
+            template_digests = [file_hash(path) for path in template_paths]
+            # Fuera de los valores, también cambian el documento los campos que
+            # llevan asterisco y el formato de montos y fechas
+            settings_digest = settings_hash(
+                sorted(user_fields or ()), COLUMN_FORMATS, DERIVED_COLUMNS, MONTHS
+            )
+
+        # Hash de los valores y NO_CONTRATO por ID, y resultados que no pasan por
+        # la generación por entregar: documentos ya vigentes y registros con
+        # valores a los que no se pudo dar formato
+        digests = {}
+        contract_numbers = {}
+        resolved = deque()
+
+        def jobs():
+            for chunk in chunks:
+                with metrics.stage('manifiesto'):
+                    records = chunk.to_dict('records')
+                # Los valores se formatean una sola vez por bloque para todas las plantillas;
+                # un valor que no se puede formatear hace fallar solo su registro
+                format_errors = {}
+                with metrics.stage('formato'):
+                    prepared = format_records(chunk, errors=format_errors).to_dict('records')
+                ready = []
+                with metrics.stage('manifiesto'):
+                    for row, record, values in zip(chunk.index, records, prepared):
+                        record_id = record.get('ID')
+                        key = str(record_id)
+                        digests[key] = row_hash(record, settings=settings_digest)
+                        if row in format_errors:
+                            resolved.extend(
+                                GenerationResult(record_id, None, format_errors[row], template=index)
+                                for index in range(len(template_paths))
+                            )
+                            continue
+                        outdated = []
+                        for index, (manifest, template_digest) in enumerate(zip(manifests, template_digests)):
+                            if manifest.is_current(record_id, digests[key], template_digest):
+                                resolved.append(GenerationResult(
+                                    record_id, manifest.filename(record_id), skipped=True, template=index
+                                ))
+                            else:
+                                outdated.append(index)
+                        if outdated:
+                            contract_numbers[key] = record.get('NO_CONTRATO')
+                            ready.append((values, tuple(outdated)))
+                # El bloque se suelta en cuanto sus trabajos se entregan
+                del chunk, records, prepared
+                yield from ready
+
+        if archive:
+            stamp = f"{datetime.now():%Y%m%d_%H%M%S}"
+            writers = [
+                ArchiveWriter(directory, f"{template_name(path)}_{stamp}", max_archive_bytes)
+                for path, directory in zip(template_paths, output_dirs)
+            ]
+
+        def all_results():
+            results = render_jobs(
+                template_paths, jobs(), output_dirs, user_fields=user_fields, fast=fast,
+                workers=workers, cancel=cancel, in_memory=bool(writers)
+            )
+            if writers:
+                results = archive_results(results, writers, contract_numbers)
+            for result in results:
+                while resolved:
+                    yield resolved.popleft()
+                yield result
+            while resolved:
+                yield resolved.popleft()
+            # Se cierran antes de la última escritura del estado (ver durable)
+            for writer in writers:
+                writer.close()
+
+        # Un documento en ZIP solo se puede leer cuando su ZIP se cierra: hasta
+        # entonces su registro no se marca como generado
+        durable = _in_closed_archive(writers) if writers else None
+
+        try:
+            # El estado se guarda por lotes, no una escritura por documento
+            results = commit_generated(all_results(), data_manager, metrics=metrics,
+                                       per_record=len(template_paths), unsaved=unsaved,
+                                       durable=durable)
+            last_template = len(template_paths) - 1
+            for processed, result in enumerate(results, 1):
+                metrics.count('documentos')
+                # Cada par registro-plantilla sale una sola vez: la última plantilla cuenta la fila
+                if result.template == last_template:
+                    metrics.count('filas')
+                if result.skipped:
+                    skipped += 1
+                    metrics.count('sin_cambios')
+                else:
+                    manifests[result.template].record(
+                        result, digests[str(result.record_id)], template_digests[result.template]
+                    )
+                    if result.error:
+                        failed.append(result)
+                        metrics.count('fallidos')
+                    else:
+                        # Con varios procesos es la suma del tiempo de todos ellos
+                        metrics.add_time('render', result.elapsed)
+                        metrics.count('generados')
+                        metrics.count('bytes_escritos', result.size)
+                        metrics.count('variables_reemplazadas', result.replaced)
+                if processed % CHECKPOINT_EVERY == 0:
+                    with metrics.stage('manifiesto'):
+                        for manifest in manifests:
+                            manifest.save()
+                if on_result:
+                    on_result(result)
+        finally:
+            try:
+                for writer in writers:
+                    writer.close()
+            finally:
+                # La última escritura del estado, con los ZIP ya cerrados; también
+                # si la corrida se interrumpe
+                results.close()
+                with metrics.stage('manifiesto'):
+                    for manifest in manifests:
+                        manifest.save()
+    cancelled = bool(cancel and cancel.is_set()) and processed < total
+    if not cancelled:
+        # Por bloques se cuentan los registros que de verdad se leyeron
+        total = processed
+    return GenerationSummary(
+        total, failed, time.perf_counter() - started, skipped,
+        processed=processed, cancelled=cancelled,
+        archives=tuple(path for writer in writers for path in writer.paths),
+        unsaved=tuple(unsaved)
+    )
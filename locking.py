@@ -0,0 +1,143 @@
+# locking.py
+import os
+import socket
+import threading
+import time
+import uuid
+
+# Cada cuánto (s) un proceso que espera revisa si el candado quedó abandonado
+STALE_CHECK_INTERVAL = 1.0
+
+
+class FileLock:
+    """
+    Candado entre procesos basado en un archivo creado de forma exclusiva.
+
+    Funciona igual en disco local y en carpetas compartidas de red, donde
+    no siempre hay bloqueos de sistema operativo fiables. Un candado más
+    viejo que stale_after segundos se considera abandonado y se libera.
+
+    La antigüedad se mide con el reloj del servidor de archivos (la fecha de
+    un archivo de prueba recién creado junto al candado), no con el de cada
+    estación, que puede estar desfasado. Para liberar un candado abandonado
+    hay que tomar antes el candado auxiliar <ruta>.break y volver a
+    comprobarlo: así dos procesos no lo liberan a la vez, ni uno borra el
+    candado que otro acaba de tomar. Cada candado guarda una marca de su
+    dueño, y release() solo borra el propio.
+
+    Un mismo objeto se puede compartir entre hilos: los hilos del proceso se
+    turnan con un threading.Lock y la marca se guarda por hilo.
+    """
+
+    def __init__(self, path, timeout=10.0, poll_interval=0.01, stale_after=60.0):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._thread_lock = threading.Lock()
+        self._local = threading.local()
+        self._next_check = 0.0
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No se pudo obtener el candado {self.path}")
+        try:
+            self._local.token = self._acquire_file(deadline)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def _acquire_file(self, deadline):
+        token = f"{os.getpid()}@{socket.gethostname()} {uuid.uuid4().hex}"
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._break_if_stale()
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"No se pudo obtener el candado {self.path}")
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                os.write(fd, token.encode())
+            finally:
+                os.close(fd)
+            return token
+
+    def _break_if_stale(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + STALE_CHECK_INTERVAL
+        if not self._is_stale(self.path):
+            return
+        breaker = self.path + '.break'
+        try:
+            fd = os.open(breaker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Quien estaba liberando el candado pudo terminar a la mitad
+            if self._is_stale(breaker):
+                _remove(breaker)
+            return
+        os.close(fd)
+        try:
+            # Con el auxiliar tomado se comprueba otra vez: otro proceso pudo
+            # liberarlo y tomarlo de nuevo desde la primera revisión
+            if self._is_stale(self.path):
+                _remove(self.path)
+        finally:
+            _remove(breaker)
+
+    def _is_stale(self, path):
+        try:
+            modified = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        return self._share_time() - modified > self.stale_after
+
+    def _share_time(self):
+        """Hora actual según el sistema de archivos donde está el candado"""
+        probe = f"{self.path}.{uuid.uuid4().hex}.now"
+        try:
+            os.close(os.open(probe, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except OSError:
+            return time.time()
+        try:
+            return os.stat(probe).st_mtime
+        finally:
+            _remove(probe)
+
+    def owner(self):
+        """Marca del dueño actual del candado (None si no está tomado)"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def release(self):
+        token = getattr(self._local, 'token', None)
+        if token is None:
+            return
+        self._local.token = None
+        try:
+            # Si se tuvo más de stale_after, otro proceso pudo liberarlo y tomarlo
+            if self.owner() == token:
+                _remove(self.path)
+        finally:
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -1,20 +1,53 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from data_manager import DataManager
-from docx import Document
+from generator import default_workers, run_generation
+from metrics import PipelineMetrics
+from preflight import check_templates, template_files
+from schema import get_form_fields
+from storage import GENERATED, PENDING, RecordFilter
+from template_engine import replace_template_content, replace_in_header_footer
 import os
 import sys
-from threading import Thread
+import queue
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from threading import Event, Thread
 import pandas as pd
 
+# Filas por columna del formulario de registro y filas creadas a la vez
+FORM_ROWS = 25
+GROUP_ROWS = 5
+
+# Intervalo de refresco del avance de la generación (ms)
+PROGRESS_INTERVAL = 50
+
+# Opciones de estado del panel de filtros
+STATUS_OPTIONS = {'Pendientes': PENDING, 'Generados': GENERATED, 'Todos': None}
+
 class ContractSystem:
     def __init__(self, root):
         self.root = root
         self.setup_paths()
         self.current_contract_type = tk.StringVar(value='adquisiciones')
         self.data_manager = DataManager(self.current_contract_type.get())
-        self.template_path = ""
+        # Plantillas de la generación: todos sus documentos se generan por registro
+        self.template_paths = []
+        self.generation_queue = queue.Queue()
+        # Métricas de la corrida en curso, para la barra de estado
+        self.generation_metrics = PipelineMetrics()
+        # Señal para detener la generación tras el documento en curso
+        self.cancel_event = Event()
+        # Verificación de plantillas y búsquedas fuera del hilo de Tk
+        self.background_executor = ThreadPoolExecutor(max_workers=1)
+        self.preflight_future = None
+        self.search_future = None
+        # Formularios ya creados por tipo de contrato
+        self.forms = {}
+        self.current_form = None
+        # Controles que se deshabilitan durante una generación: (control, estado habilitado)
+        self.run_inputs = []
         self.setup_ui()
 
     def setup_paths(self):
@@ -57,11 +90,13 @@ class ContractSystem:
         )
         type_selector.pack(side=tk.LEFT, padx=10)
         type_selector.bind('<<ComboboxSelected>>', self.update_contract_type)
+        # Cambiar de tipo a media corrida haría guardar el estado en el otro archivo
+        self.run_inputs.append((type_selector, 'readonly'))
 
     def update_contract_type(self, event=None):
         """Actualiza los componentes al cambiar el tipo de contrato"""
         self.data_manager.switch_contract_type(self.current_contract_type.get())
-        self.template_path = ""
+        self.template_paths = []
         self.clear_form()
         self.rebuild_form()
 
@@ -78,172 +113,100 @@ class ContractSystem:
         self.create_generation_tab()
 
     def rebuild_form(self):
-        """se reconstruye el formulario según el tipo de contrato"""
-        for widget in self.tab_registro.winfo_children():
-            widget.destroy()
-        self.create_full_registration_tab()
+        """Muestra el formulario del tipo de contrato actual, creándolo solo la primera vez"""
+        contract_type = self.current_contract_type.get()
+        if self.current_form is not None:
+            self.current_form['frame'].pack_forget()
+        if contract_type not in self.forms:
+            self.forms[contract_type] = self.create_full_registration_tab(contract_type)
+        
+        self.current_form = self.forms[contract_type]
+        self.current_form['frame'].pack(fill='both', expand=True)
+        self.current_fields = [field for field, _ in self.current_form['fields']]
+        self.entries = self.current_form['entries']
 
-    def create_full_registration_tab(self):
-        """Crea los campos del formulario dinámicamente"""
+    def create_full_registration_tab(self, contract_type):
+        """
+        Crea el formulario de un tipo de contrato.
+        Los campos se crean por grupos de filas a medida que se hacen visibles.
+        """
         main_frame = ttk.Frame(self.tab_registro)
-        main_frame.pack(fill='both', expand=True)
         
         # Configurar scroll
         canvas = tk.Canvas(main_frame)
         scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=canvas.yview)
         scrollable_frame = ttk.Frame(canvas)
         #definir campos según tipo de contrato
-        if self.current_contract_type.get() == 'adquisiciones':
-        # Lista completa de campos según Excel
-            fields = [
-                ('NO_CONTRATO', 'entry'),
-                ('BIENES', 'text'),
-                ('TITULAR_AREA_REQUIRENTE', 'entry'),
-                ('TITULAR_AREA', 'entry'),
-                ('PROVEEDOR', 'entry'),
-                ('NOM_PROVEEDOR', 'entry'),
-                ('CARGO_PROVEEDOR', 'entry'),
-                ('CARGO_AREA_REQUIRENTE', 'entry'),
-                ('FECHA_NOMBRAMIENTO', 'entry'),
-                ('FECHA_CELEBRACION', 'text'),
-                ('FUNDAMENTO', 'text'),
-                ('NO_REQUISICION', 'text'),
-                ('TIPO_ADQUISICION', 'entry'),
-                ('ADQUISICION', 'text'),
-                ('NECESIDADES', 'text'),
-                ('PARTIDA_DENOMINACION', 'entry'),
-                ('NO_OFICIO', 'entry'),
-                ('NO_ESCRITURA_PUBLICA', 'entry'),
-                ('FECHA_PUBLICACION', 'entry'),
-                ('TITULAR_NOTARIA', 'entry'),
-                ('NO_NOTARIA', 'entry'),
-                ('NO_MERCANTIL', 'entry'),
-                ('ENTIDAD_FEDERATIVA', 'entry'),
-                ('DIA', 'entry'),
-                ('OBJETO_SOCIAL', 'text'),
-                ('PERSONA_FISICA', 'entry'),
-                ('CARACTER_PERSONA_FISICA', 'entry'),
-                ('IDENTIFICACION', 'entry'),
-                ('NO_DOCUMENTO', 'entry'),
-                ('INSTITUCION', 'entry'),
-                ('FOLIO_REGISTRO_PROVEEDOR', 'entry'),
-                ('NO_ESCRITURA', 'entry'),
-                ('FECHA_PUBLICACION2', 'entry'),
-                ('INE_NOTARIO', 'entry'),
-                ('RFC', 'entry'),
-                ('NO_CONSTANCIA', 'entry'),
-                ('FECHA_EXPEDICION', 'entry'),
-                ('ANEXOS', 'text'),
-                ('CONSTANCIAS', 'text'),
-                ('DOMICILIO', 'entry'),
-                ('NUMERO', 'entry'),
-                ('COLONIA', 'entry'),
-                ('ALCALDIA', 'entry'),
-                ('CP', 'entry'),
-                ('TELEFONOS', 'entry'),
-                ('CORREO', 'entry'),
-                ('CALLE', 'entry'),
-                ('NO_EXT', 'entry'),
-                ('DESCRIPCION_ADQUISICION', 'text'),
-                ('NO_REQUERIMIENTO', 'entry'),
-                ('PARTIDA_PRESUPUESTAL', 'entry'),
-                ('MONTO_AUTORIZADO', 'entry'),
-                ('CORREO_1', 'entry'),
-                ('CORREO_2', 'entry'),
-                ('FECHA_ENTREGA', 'entry'),
-                ('FECHA_VIGENCIA_ENTREGA', 'entry'),
-                ('VIGENCIA_CONTRATO', 'entry'),
-                ('NO_PAG', 'entry'),
-                ('DIAS', 'entry'),
-                ('MES', 'entry'),
-                ('DIA_FIRMA', 'entry'),
-                ('MES_FIRMA', 'entry'),
-                ('DIRECCION_DE', 'entry')
-            ]
-        else: 
-            fields = [
-                ('NO_CONTRATO', 'entry'),
-                ('SERVICIOS', 'entry'),
-                ('TITULAR_AREA_REQUIRENTE', 'entry'),
-                ('TITULAR_AREA', 'entry'),
-                ('PROVEEDOR', 'entry'),
-                ('NOM_PROVEEDOR', 'entry'),
-                ('CARGO_PROVEEDOR', 'entry'),
-                ('CARGO_AREA_REQUIRENTE', 'entry'),
-                ('FECHA_NOMBRAMIENTO', 'entry'),
-                ('TIPO_ADQUISICION', 'entry'),
-                ('DESCRIPCION_ADQUISICION', 'entry'),
-                ('NO_REQUERIMIENTO', 'entry'),
-                ('NECESIDADES', 'entry'),
-                ('PARTIDA_DENOMINACION', 'entry'),
-                ('NO_OFICIO', 'entry'),
-                ('FECHA_NOMBRAMIENTO', 'entry'),
-                ('NO_ESCRITURA_PUBLICA', 'entry'),
-                ('FECHA_ESCRITURA_PUBLICA', 'entry'),
-                ('TITULAR_NOTARIA', 'entry'),
-                ('NO_NOTARIA', 'entry'),
-                ('NO_MERCANTIL', 'entry'),
-                ('ENTIDAD_FEDERATIVA', 'entry'),
-                ('INE_NOTARIA', 'entry'),
-                ('DIA', 'entry'),
-                ('OBJETO_SOCIAL', 'text'),
-                ('PERSONA_FISICA', 'entry'),
-                ('CARGO_PERSONA_FISICA', 'entry'),
-                ('CARGO_REPRESENTANTE', 'entry'),
-                ('IDENTIFICACION', 'entry'),
-                ('NO_DOCUMENTO', 'entry'),
-                ('INSTITUTO', 'entry'),
-                ('SEÑALAR_RELACION_CON', 'text'),
-                ('NACIONALIDAD', 'entry'),
-                ('NO_INE', 'entry'),
-                ('EXTRANJERO', 'entry'),
-                ('IDENTIFICACION2', 'entry'),
-                ('DENOMINACION', 'entry'),
-                ('OBJ_SOCIAL', 'text'),
-                ('FOLIO', 'entry'),
-                ('RFC', 'entry'),
-                ('NO_CONSTANCIA', 'entry'),
-                ('FECHA_CONSTANCIA', 'entry'),
-                ('ANEXOS', 'text'),
-                ('CONSTANCIAS', 'text'),
-                ('DOMICILIO', 'entry'),
-                ('ALCALDIA', 'entry'),
-                ('CP', 'entry'),
-                ('TELEFONOS', 'entry'),
-                ('CORREO', 'entry'),
-                ('CALLE', 'entry'),
-                ('NO_EXT', 'entry'),
-                ('DOMICILIO_CONTRATANTE', 'entry'),
-                ('SERVICIO_PROVEEDOR', 'entry'),
-                ('NO_SERV', 'entry'),
-                ('PARTIDA_PRESUPUESTAL', 'entry'),
-                ('MONTO_AUTORIZADO', 'entry'),
-                ('CORREO_1', 'entry'),
-                ('CORREO_2', 'entry'),
-                ('NOM_COORDINADOR', 'entry'),
-                ('FECHA_ENTREGA', 'entry'),
-                ('FECHA_TERMINO', 'entry'),
-                ('FECHA_FIRMA', 'entry'),
-                ('NO_PAG', 'entry'),
-                ('FECHA_CELEBRACION', 'entry'),
-                ('DIRECCION_DE', 'entry')
-            ]
-   
-        self.current_fields = [field[0] for field in fields]
-
-            # Crear campos dinámicamente
-        self.entries = {}
+        fields = get_form_fields(contract_type)
+
+        # Agrupar por bloques de filas: cada bloque abarca todas las columnas
+        groups = [[] for _ in range((FORM_ROWS + GROUP_ROWS - 1) // GROUP_ROWS)]
         for idx, (field, ftype) in enumerate(fields):
-            row = idx % 25
-            col = idx // 25
+            groups[(idx % FORM_ROWS) // GROUP_ROWS].append((idx, field, ftype))
+        
+        form = {
+            'frame': main_frame,
+            'inner': scrollable_frame,
+            'fields': fields,
+            'entries': {},
+            'groups': [group for group in groups if group],
+            'built': 0,
+            'pending_build': False
+        }
+            
+        # Configurar scroll y botones
+        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            # Al llegar al final de lo ya creado se agrega el siguiente grupo
+            if float(last) >= 0.999:
+                self.schedule_field_group(form)
+        canvas.configure(yscrollcommand=on_scroll)
+            
+        canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+            
+        # Botones - FUERA DEL SCROLLABLE FRAME
+        btn_frame = ttk.Frame(main_frame)  # Frame principal, no el scrollable
+        btn_frame.pack(side=tk.BOTTOM, pady=10)  # Posiciona debajo del scroll
+    
+        ttk.Button(btn_frame, text="Guardar", command=self.save_data).pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="Limpiar", command=self.clear_form).pack(side=tk.LEFT, padx=10)
+        import_button = ttk.Button(btn_frame, text="Importar Archivo", command=self.import_data)
+        import_button.pack(side=tk.LEFT, padx=10)
+        # Importar reemplaza los registros que la generación está marcando
+        self.run_inputs.append((import_button, tk.NORMAL))
+        
+        self.schedule_field_group(form)
+        return form
+
+    def schedule_field_group(self, form):
+        """Programa la creación del siguiente grupo de campos, si queda alguno"""
+        if form['pending_build'] or form['built'] >= len(form['groups']):
+            return
+        form['pending_build'] = True
+        self.root.after_idle(lambda: self.build_field_group(form))
+
+    def build_field_group(self, form):
+        """Crea los widgets del siguiente grupo de campos de un formulario"""
+        form['pending_build'] = False
+        group = form['groups'][form['built']]
+        form['built'] += 1
+        
+        # Crear campos dinámicamente
+        for idx, field, ftype in group:
+            row = idx % FORM_ROWS
+            col = idx // FORM_ROWS
                 
-            lbl_frame = ttk.Frame(scrollable_frame)
+            lbl_frame = ttk.Frame(form['inner'])
             lbl_frame.grid(row=row, column=col*2, padx=5, pady=2, sticky='w')
                 
             lbl = ttk.Label(lbl_frame, text=f"{self.format_label(field)}:")
             lbl.pack(side='left')
                 
-            entry_frame = ttk.Frame(scrollable_frame)
+            entry_frame = ttk.Frame(form['inner'])
             entry_frame.grid(row=row, column=col*2+1, padx=5, pady=2, sticky='ew')
                 
             if ftype == 'entry':
@@ -253,22 +216,7 @@ class ContractSystem:
                 entry = tk.Text(entry_frame, height=3, width=30)
                 entry.pack(fill='x')
                 
-            self.entries[field] = entry
-            
-        # Configurar scroll y botones
-        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-            
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-            
-        # Botones - FUERA DEL SCROLLABLE FRAME
-        btn_frame = ttk.Frame(main_frame)  # Frame principal, no el scrollable
-        btn_frame.pack(side=tk.BOTTOM, pady=10)  # Posiciona debajo del scroll
-    
-        ttk.Button(btn_frame, text="Guardar", command=self.save_data).pack(side=tk.LEFT, padx=10)
-        ttk.Button(btn_frame, text="Limpiar", command=self.clear_form).pack(side=tk.LEFT, padx=10)
+            form['entries'][field] = entry
 
     def create_generation_tab(self):
         """Crea la pestaña de generación de documentos"""
@@ -278,22 +226,128 @@ class ContractSystem:
         control_frame = ttk.Frame(frame)
         control_frame.pack(fill=tk.X, pady=10)
         
-        ttk.Button(control_frame, text="Seleccionar Plantilla", 
-                 command=self.select_template).pack(side=tk.LEFT)
-        ttk.Button(control_frame, text="Generar Todos", 
-                 command=self.start_bulk_generation).pack(side=tk.LEFT, padx=10)
+        select_button = ttk.Button(control_frame, text="Seleccionar Plantilla", 
+                 command=self.select_template)
+        select_button.pack(side=tk.LEFT)
+        all_button = ttk.Button(control_frame, text="Todas las Plantillas", 
+                 command=self.select_all_templates)
+        all_button.pack(side=tk.LEFT, padx=(10, 0))
+        self.run_inputs += [(select_button, tk.NORMAL), (all_button, tk.NORMAL)]
+        self.generate_button = ttk.Button(control_frame, text="Generar Todos", 
+                 command=self.start_bulk_generation)
+        self.generate_button.pack(side=tk.LEFT, padx=10)
+        self.cancel_button = ttk.Button(control_frame, text="Cancelar", 
+                 command=self.cancel_generation, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT)
         ttk.Button(control_frame, text="Abrir Carpeta", 
                  command=self.open_output_dir).pack(side=tk.RIGHT)
         
+        # Modo rápido: reemplazo de texto directo sobre el XML de la plantilla
+        self.fast_mode = tk.BooleanVar(value=False)
+        # Incremental: revisar también los ya generados y rehacer solo los que cambiaron
+        self.incremental_mode = tk.BooleanVar(value=False)
+        # Salida en un archivo ZIP con manifest.csv en lugar de archivos sueltos
+        self.archive_mode = tk.BooleanVar(value=False)
+        # Por bloques: memoria acotada para lotes muy grandes
+        self.stream_mode = tk.BooleanVar(value=False)
+        for text, variable in (("Modo rápido (solo texto)", self.fast_mode),
+                               ("Solo cambios", self.incremental_mode),
+                               ("Guardar en ZIP", self.archive_mode),
+                               ("Por bloques", self.stream_mode)):
+            check = ttk.Checkbutton(control_frame, text=text, variable=variable)
+            check.pack(side=tk.LEFT, padx=10)
+            self.run_inputs.append((check, tk.NORMAL))
+        
+        # Procesos en paralelo para la generación masiva
+        ttk.Label(control_frame, text="Procesos:").pack(side=tk.LEFT)
+        self.worker_count = tk.IntVar(value=default_workers())
+        spinbox = ttk.Spinbox(control_frame, from_=1, to=default_workers(), width=4, 
+                 textvariable=self.worker_count)
+        spinbox.pack(side=tk.LEFT, padx=5)
+        self.run_inputs.append((spinbox, tk.NORMAL))
+        
+        self.create_filter_panel(frame)
+        
         self.progress = ttk.Progressbar(frame, orient=tk.HORIZONTAL, mode='determinate')
         self.progress.pack(fill=tk.X)
 
+    def create_filter_panel(self, parent):
+        """Panel para elegir qué registros se generan"""
+        filter_frame = ttk.LabelFrame(parent, text="Filtrar registros", padding=5)
+        filter_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.filter_entries = {}
+        for label, key in (("Desde (AAAA-MM-DD):", 'date_from'), ("Hasta:", 'date_to'),
+                           ("No. contrato:", 'contract_number'), ("Proveedor:", 'supplier'),
+                           ("RFC:", 'rfc')):
+            ttk.Label(filter_frame, text=label).pack(side=tk.LEFT)
+            entry = ttk.Entry(filter_frame, width=12)
+            entry.pack(side=tk.LEFT, padx=(2, 10))
+            self.filter_entries[key] = entry
+            self.run_inputs.append((entry, tk.NORMAL))
+        
+        ttk.Label(filter_frame, text="Estado:").pack(side=tk.LEFT)
+        self.filter_status = tk.StringVar(value='Pendientes')
+        status_selector = ttk.Combobox(filter_frame, textvariable=self.filter_status,
+                 values=list(STATUS_OPTIONS), state="readonly", width=11)
+        status_selector.pack(side=tk.LEFT, padx=(2, 10))
+        
+        search_button = ttk.Button(filter_frame, text="Buscar", 
+                 command=self.search_records)
+        search_button.pack(side=tk.LEFT)
+        self.run_inputs += [(status_selector, 'readonly'), (search_button, tk.NORMAL)]
+        self.search_result = ttk.Label(filter_frame, text="")
+        self.search_result.pack(side=tk.LEFT, padx=10)
+
+    def read_record_filter(self):
+        """
+        Criterios del panel de filtros
+        Returns:
+            RecordFilter
+        Raises:
+            ValueError: Si una fecha no tiene el formato AAAA-MM-DD
+        """
+        values = {key: entry.get().strip() or None for key, entry in self.filter_entries.items()}
+        for key in ('date_from', 'date_to'):
+            if values[key]:
+                try:
+                    values[key] = datetime.strptime(values[key], '%Y-%m-%d').date()
+                except ValueError:
+                    raise ValueError(f"Fecha inválida: {values[key]} (use AAAA-MM-DD)")
+        return RecordFilter(status=STATUS_OPTIONS[self.filter_status.get()], **values)
+
+    def search_records(self):
+        """Cuenta en segundo plano los registros que cumplen los filtros"""
+        try:
+            record_filter = self.read_record_filter()
+        except ValueError as e:
+            messagebox.showwarning("Filtro inválido", str(e))
+            return
+        self.search_result.config(text="Buscando...")
+        self.search_future = self.background_executor.submit(
+            self.data_manager.query_records, record_filter, ['ID']
+        )
+        self.root.after(PROGRESS_INTERVAL, self.show_search_result)
+
+    def show_search_result(self):
+        """Muestra el número de registros encontrados cuando termina la búsqueda"""
+        future = self.search_future
+        if not future.done():
+            self.root.after(PROGRESS_INTERVAL, self.show_search_result)
+            return
+        try:
+            self.search_result.config(text=f"{len(future.result())} registros")
+        except Exception as e:
+            self.search_result.config(text="")
+            self.update_status(f"No se pudo buscar: {str(e)}")
+
     def format_label(self, text):
         """Formatea los nombres de los campos para mostrar"""
         return text.replace('_', ' ').title()
 
     def save_data(self):
-        data = {}
+        # Los campos de grupos aún no creados van vacíos
+        data = {field: '' for field in self.current_fields}
         for field, entry in self.entries.items():
             if isinstance(entry, tk.Text):
                 data[field] = entry.get("1.0", tk.END).strip()
@@ -307,6 +361,35 @@ class ContractSystem:
         else:
             messagebox.showerror("Error", message)
 
+    def import_data(self):
+        """Importa un lote de registros desde CSV o Excel"""
+        path = filedialog.askopenfilename(
+            filetypes=[("Registros", "*.csv *.xlsx *.xls")],
+            title=f"Importar registros de {self.current_contract_type.get()}"
+        )
+        if not path:
+            return
+        
+        try:
+            imported, errors = self.data_manager.import_records(path)
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo importar el archivo: {str(e)}")
+            return
+        
+        if errors.empty:
+            messagebox.showinfo("Éxito", f"Se importaron {imported} registros")
+            return
+        
+        # Reporte de errores por fila junto al archivo importado
+        report_path = os.path.splitext(path)[0] + "_errores.csv"
+        errors.to_csv(report_path, index=False, encoding='utf-8-sig')
+        messagebox.showwarning(
+            "Importación con errores",
+            f"Se importaron {imported} registros.\n"
+            f"{len(errors)} filas tienen errores y no se importaron.\n"
+            f"Reporte: {report_path}"
+        )
+
     def clear_form(self):
         for entry in self.entries.values():
             if isinstance(entry, tk.Text):
@@ -319,113 +402,257 @@ class ContractSystem:
         initial_dir = os.path.join(self.template_dir, contract_type)
         os.makedirs(initial_dir, exist_ok=True)
         
-        # Solo permitir .docx
-        self.template_path = filedialog.askopenfilename(
+        # Solo permitir .docx; se pueden elegir varias (contrato, anexos, oficios...)
+        paths = filedialog.askopenfilenames(
             initialdir=initial_dir,
             filetypes=[("Plantillas Word", "*.docx *doc")],
-            title=f"Seleccionar plantilla de {contract_type}"
+            title=f"Seleccionar plantillas de {contract_type}"
+        )
+        if paths:
+            self.use_templates(list(paths))
+
+    def select_all_templates(self):
+        """Usa todas las plantillas de plantillas_word/<tipo>"""
+        contract_type = self.current_contract_type.get()
+        paths = template_files(self.template_dir, contract_type)
+        if not paths:
+            messagebox.showwarning("Advertencia", f"No hay plantillas en plantillas_word/{contract_type}")
+            return
+        self.use_templates(paths)
+
+    def use_templates(self, paths):
+        """Selecciona las plantillas y las verifica en segundo plano"""
+        self.template_paths = paths
+        contract_type = self.current_contract_type.get()
+        
+        # Se verifican las elegidas y, de paso, las demás plantillas del tipo
+        self.update_status(f"Verificando plantillas de {contract_type}...")
+        selected = {os.path.normcase(os.path.abspath(path)) for path in paths}
+        others = [path for path in template_files(self.template_dir, contract_type)
+                  if os.path.normcase(os.path.abspath(path)) not in selected]
+        self.preflight_future = self.background_executor.submit(
+            check_templates, self.data_manager, paths + others, stream=self.stream_mode.get()
         )
-        if self.template_path:
-            self.update_status(f"Plantilla: {os.path.basename(self.template_path)}")
+        self.root.after(PROGRESS_INTERVAL, self.show_preflight_result)
+
+    def show_preflight_result(self):
+        """Muestra el resultado de la verificación de plantillas cuando termina"""
+        future = self.preflight_future
+        if not future.done():
+            self.root.after(PROGRESS_INTERVAL, self.show_preflight_result)
+            return
+        try:
+            checks = future.result()
+        except Exception as e:
+            self.update_status(f"No se pudo verificar la plantilla: {str(e)}")
+            return
+        count = len(self.template_paths)
+        selected, others = checks[:count], checks[count:]
+        if [check.path for check in selected] != self.template_paths:
+            # Se eligieron otras plantillas mientras tanto
+            return
+        
+        names = ", ".join(os.path.basename(check.path) for check in selected)
+        failing = [f"{os.path.basename(check.path)}: {check.describe().splitlines()[0]}"
+                   for check in others if not check.ok]
+        if failing:
+            messagebox.showwarning(
+                "Otras plantillas con problemas", "\n".join(failing)
+            )
+        problems = [check for check in selected if not check.ok]
+        if not problems:
+            variables = sum(len(check.placeholders) for check in selected)
+            self.update_status(f"Plantilla: {names} ({variables} variables verificadas)")
+            return
+        
+        details = "\n\n".join(f"{os.path.basename(check.path)}\n{check.describe()}" for check in problems)
+        keep = messagebox.askyesno(
+            "Plantilla con problemas",
+            f"{details}\n\n¿Usar estas plantillas de todos modos?"
+        )
+        if keep:
+            self.update_status(f"Plantilla: {names} (con advertencias)")
+        else:
+            self.template_paths = []
+            self.update_status("Seleccione una plantilla")
 
     
     def start_bulk_generation(self):
-        if not self.template_path:
+        if not self.template_paths:
             messagebox.showwarning("Advertencia", "Seleccione una plantilla primero")
             return
         
-        Thread(target=self.generate_all_documents, daemon=True).start()
+        try:
+            record_filter = self.read_record_filter()
+        except ValueError as e:
+            messagebox.showwarning("Filtro inválido", str(e))
+            return
+        
+        # Las opciones se leen aquí: las variables de Tk no se tocan desde el hilo
+        options = {
+            'fast': self.fast_mode.get(),
+            # Con estado "Todos" también se revisan los ya generados
+            'incremental': self.incremental_mode.get() or record_filter.status is None,
+            'workers': self.read_worker_count(),
+            'archive': self.archive_mode.get(),
+            'query': record_filter,
+            'stream': self.stream_mode.get()
+        }
+        self.cancel_event.clear()
+        self.set_generation_running(True)
+        Thread(target=self.generate_all_documents, kwargs=options, daemon=True).start()
+        self.root.after(PROGRESS_INTERVAL, self.process_generation_events)
+
+    def read_worker_count(self):
+        """
+        Procesos elegidos, entre 1 y default_workers(); si el campo está vacío
+        o no es un número se usa el valor por defecto
+        """
+        try:
+            workers = int(self.worker_count.get())
+        except (tk.TclError, ValueError):
+            workers = default_workers()
+            self.worker_count.set(workers)
+        return max(1, min(workers, default_workers()))
 
-    def generate_all_documents(self):
-        """Genera los documentos según el tipo de contrato"""
+    def cancel_generation(self):
+        """Detiene la generación en curso tras el documento que se está generando"""
+        self.cancel_event.set()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.update_status("Cancelando tras el documento en curso...")
+
+    def set_generation_running(self, running):
+        """
+        Habilita los botones según haya o no una generación en curso; durante
+        la corrida no se puede cambiar el tipo, las plantillas ni las opciones
+        """
+        self.generate_button.config(state=tk.DISABLED if running else tk.NORMAL)
+        self.cancel_button.config(state=tk.NORMAL if running else tk.DISABLED)
+        for widget, enabled in self.run_inputs:
+            widget.config(state=tk.DISABLED if running else enabled)
+
+    def generate_all_documents(self, fast=False, incremental=False, workers=1, archive=False,
+                               query=None, stream=False):
+        """
+        Genera los documentos según el tipo de contrato.
+        Se ejecuta en un hilo aparte y comunica el avance por generation_queue.
+        """
         try:
             # Validación crítica antes de comenzar
-            if not self.template_path:
+            if not self.template_paths:
                 raise ValueError("No se ha seleccionado ninguna plantilla")
                 
             # Normalizar rutas y verificar existencia
-            template_path = os.path.normpath(self.template_path)
-            if not os.path.exists(template_path):
-                raise FileNotFoundError(f"Archivo de plantilla no encontrado: {template_path}")
-
-            # Obtener registros pendientes
-            df = self.data_manager.get_pending_records()
-            total = len(df)
-            
-            if total == 0:
-                messagebox.showinfo("Información", "No hay contratos pendientes")
-                return
+            template_paths = [os.path.normpath(path) for path in self.template_paths]
+            for template_path in template_paths:
+                if not os.path.exists(template_path):
+                    raise FileNotFoundError(f"Archivo de plantilla no encontrado: {template_path}")
 
-            # Configurar progreso
-            self.progress['maximum'] = total
-            os.makedirs(self.output_dir, exist_ok=True)
+            # Perfilado opcional: CONTRATOS_PERFIL=cpu o CONTRATOS_PERFIL=memoria
+            self.generation_metrics = PipelineMetrics()
+            summary = run_generation(
+                self.data_manager, template_paths, self.output_dir,
+                user_fields=self.current_fields, fast=fast, workers=workers,
+                incremental=incremental,
+                on_start=lambda total: self.generation_queue.put(('start', total)),
+                on_result=lambda result: self.generation_queue.put(('progress', result)),
+                metrics=self.generation_metrics,
+                profile=os.environ.get('CONTRATOS_PERFIL') or None,
+                cancel=self.cancel_event,
+                archive=archive,
+                query=query,
+                stream=stream
+            )
             
-            # Obtener extensión del archivo plantilla
-            file_extension = os.path.splitext(template_path)[1]
-
-            for idx, (_, row) in enumerate(df.iterrows()):
-                # Cargar plantilla
-                doc = Document(template_path)
-                replacements = row.to_dict()
+            if summary.total == 0:
+                self.generation_queue.put(('info', "No hay contratos pendientes"))
+            else:
+                self.generation_queue.put(('done', summary))
             
-                # Agregar asterisco a los campos capturados por el usuario
-                for field in self.current_fields:  # Usar la lista de campos actual
-                    if field in replacements:
-                        replacements[field] = f"*{replacements[field]}*"    
-
-                # Campos adicionales dinámicos
-                replacements['FECHA_GENERACION'] = datetime.now().strftime("%d/%m/%Y %H:%M")
-
-                # Reemplazo en todo el documento
-                self.replace_template_content(doc, replacements)
+        except Exception as e:
+            self.generation_queue.put(('error', str(e)))
 
-                # Generar nombre de archivo seguro
-                contract_number = str(row['NO_CONTRATO']).replace('/', '_').strip()
-                filename = f"Contrato_{contract_number}{file_extension}"
-                output_path = os.path.join(self.output_dir, filename)
-                
-                # Guardar documento
-                doc.save(output_path)
-                
-                # Actualizar estado
-                self.data_manager.mark_as_generated(row['ID'])
-                self.progress['value'] = idx + 1
-                self.update_status(f"Generado: {filename}")
+    def process_generation_events(self):
+        """
+        Atiende en el hilo de Tk los eventos enviados por la generación.
+        En cada ciclo se vacía la cola y la barra de avance y el estado se
+        actualizan una sola vez, aunque hayan llegado muchos documentos.
+        """
+        advanced = 0
+        last_error = None
+        finished = None
+        while finished is None:
+            try:
+                event, *args = self.generation_queue.get_nowait()
+            except queue.Empty:
+                break
             
-            messagebox.showinfo("Éxito", f"Se generaron {total} contratos exitosamente")
-            self.progress['value'] = 0
-            
-        except Exception as e:
-            messagebox.showerror("Error Crítico", f"Fallo en generación: {str(e)}")
-            self.progress['value'] = 0
+            if event == 'start':
+                self.progress['maximum'] = args[0]
+                self.progress['value'] = 0
+            elif event == 'progress':
+                advanced += 1
+                if args[0].error:
+                    last_error = args[0]
+            else:
+                finished = (event, args)
+        
+        if advanced:
+            self.progress['value'] += advanced
+            if last_error:
+                self.update_status(f"Error en registro {last_error.record_id}: {last_error.error}")
+            else:
+                self.update_status(self.generation_metrics.summary_text())
+        
+        if finished is None:
+            self.root.after(PROGRESS_INTERVAL, self.process_generation_events)
+            return
+        
+        self.set_generation_running(False)
+        event, args = finished
+        if event == 'done':
+            summary = args[0]
+            self.update_status(self.generation_metrics.summary_text())
+            unchanged = f"\n{summary.skipped} sin cambios." if summary.skipped else ""
+            if summary.archives:
+                unchanged += "\nZIP: " + ", ".join(os.path.basename(path) for path in summary.archives)
+            if summary.unsaved:
+                messagebox.showwarning(
+                    "Estado no guardado",
+                    f"No se pudo marcar como generados {len(summary.unsaved)} registros "
+                    "(¿el archivo de contratos está abierto en Excel?). "
+                    "Sus documentos sí se generaron; en la próxima corrida se volverán a generar."
+                )
+            if summary.cancelled:
+                messagebox.showinfo(
+                    "Generación cancelada",
+                    f"Se generaron {summary.generated} de {summary.total} documentos "
+                    f"antes de cancelar.{unchanged}"
+                )
+            elif summary.failed:
+                details = "\n".join(f"{r.record_id}: {r.error}" for r in summary.failed[:10])
+                messagebox.showwarning(
+                    "Generación incompleta",
+                    f"Se generaron {summary.generated} de {summary.total} documentos.{unchanged}\n"
+                    f"Fallaron {len(summary.failed)}:\n{details}"
+                )
+            else:
+                messagebox.showinfo(
+                    "Éxito", f"Se generaron {summary.generated} documentos exitosamente{unchanged}"
+                )
+        elif event == 'info':
+            messagebox.showinfo("Información", args[0])
+        elif event == 'error':
+            messagebox.showerror("Error Crítico", f"Fallo en generación: {args[0]}")
+        self.progress['value'] = 0
 
     def replace_template_content(self, doc, replacements):
         """Realiza el reemplazo de variables en toda la plantilla"""
-        # Reemplazar en párrafos
-        for paragraph in doc.paragraphs:
-            for key, value in replacements.items():
-                if f'{{{{{key}}}}}' in paragraph.text:
-                    paragraph.text = paragraph.text.replace(f'{{{{{key}}}}}', str(value))
-        
-        # Reemplazar en tablas
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for key, value in replacements.items():
-                        if f'{{{{{key}}}}}' in cell.text:
-                            cell.text = cell.text.replace(f'{{{{{key}}}}}', str(value))
-        
-        # Reemplazar en encabezados y pies de página
-        for section in doc.sections:
-            self.replace_in_header_footer(section.header, replacements)
-            self.replace_in_header_footer(section.footer, replacements)
+        replace_template_content(doc, replacements)
 
     def replace_in_header_footer(self, header_footer, replacements):
         """Reemplaza contenido en encabezados y pies de página"""
-        for paragraph in header_footer.paragraphs:
-            for key, value in replacements.items():
-                if f'{{{{{key}}}}}' in paragraph.text:
-                    paragraph.text = paragraph.text.replace(f'{{{{{key}}}}}', str(value))
+        replace_in_header_footer(header_footer, replacements)
 
     def open_output_dir(self):
         try:
@@ -434,10 +661,12 @@ class ContractSystem:
             messagebox.showerror("Error", f"No se pudo abrir la carpeta: {str(e)}")
 
     def update_status(self, message):
+        """Muestra un mensaje en la barra de estado (solo desde el hilo de Tk)"""
         self.status_bar.config(text=message)
-        self.root.update_idletasks()
 
 if __name__ == "__main__":
+    # Necesario para los procesos de generación en el ejecutable congelado
+    multiprocessing.freeze_support()
     root = tk.Tk()
     root.geometry("1400x900")
     app = ContractSystem(root)
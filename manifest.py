@@ -0,0 +1,112 @@
+# manifest.py
+import hashlib
+import json
+import math
+import os
+import zipfile
+
+
+def file_hash(path):
+    """Hash SHA-1 del contenido de un archivo"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def settings_hash(*settings):
+    """Hash de la configuración que, además de los valores, cambia los documentos"""
+    text = json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def row_hash(record, exclude=('GENERADO',), settings=''):
+    """
+    Hash de los valores de un registro.
+    Los valores se comparan como texto y los vacíos (None/NaN) como '',
+    para que un ID leído como número o como texto dé el mismo hash.
+    settings (ver settings_hash) entra en el hash: si cambia, todas las
+    filas cuentan como cambiadas.
+    """
+    values = {
+        str(key): '' if value is None or (isinstance(value, float) and math.isnan(value)) else str(value)
+        for key, value in record.items() if key not in exclude
+    }
+    text = json.dumps([settings, values], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class RunManifest:
+    """
+    Manifiesto de generación guardado junto a los documentos.
+
+    Por cada ID de registro guarda el archivo generado (o el ZIP que lo
+    contiene y el nombre dentro de él), el hash de los valores de la fila,
+    el hash de la plantilla y el resultado. Un registro cuyo documento
+    existe y cuyas entradas no cambiaron no necesita generarse de nuevo.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        # Documentos de cada ZIP leído: {ruta: (mtime, nombres)}
+        self._archives = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f).get('records', {})
+
+    def is_current(self, record_id, row_digest, template_digest):
+        """True si el documento del registro ya está generado con estas entradas"""
+        entry = self.entries.get(str(record_id))
+        return bool(
+            entry
+            and entry['status'] == 'ok'
+            and entry['row_hash'] == row_digest
+            and entry['template_hash'] == template_digest
+            and self._exists(entry)
+        )
+
+    def _exists(self, entry):
+        path = os.path.join(os.path.dirname(self.path), entry['path'])
+        member = entry.get('member')
+        if not member:
+            return os.path.exists(path)
+        # Un ZIP que quedó abierto por un corte no tiene directorio central y no se puede leer
+        return member in self._archive_members(path)
+
+    def _archive_members(self, path):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return set()
+        cached = self._archives.get(path)
+        if cached is None or cached[0] != mtime:
+            try:
+                with zipfile.ZipFile(path) as archive:
+                    members = set(archive.namelist())
+            except (OSError, zipfile.BadZipFile):
+                members = set()
+            cached = self._archives[path] = (mtime, members)
+        return cached[1]
+
+    def filename(self, record_id):
+        return self.entries[str(record_id)]['path']
+
+    def record(self, result, row_digest, template_digest):
+        """Registra el resultado de generar un documento"""
+        self.entries[str(result.record_id)] = {
+            'path': result.archive or result.filename,
+            'member': result.filename if result.archive else None,
+            'row_hash': row_digest,
+            'template_hash': template_digest,
+            'status': 'error' if result.error else 'ok',
+            'error': result.error
+        }
+
+    def save(self):
+        # Escritura atómica: un corte no deja el manifiesto a medias
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'records': self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,162 @@
+# metrics.py
+"""
+Medición de la generación masiva: tiempo por etapa, contadores, registro
+en JSON Lines con rotación y perfilado opcional de una corrida.
+"""
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+# Registro de métricas, junto a la carpeta de salida
+METRICS_LOG = 'metricas_generacion.jsonl'
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+
+# Modos de perfilado: cProfile (tiempo de CPU) o tracemalloc (memoria)
+PROFILE_MODES = ('cpu', 'memoria')
+
+# Líneas de asignaciones que se guardan en el perfil de memoria
+MEMORY_TOP = 50
+
+
+class PipelineMetrics:
+    """
+    Tiempos acumulados por etapa y contadores de una corrida.
+
+    La generación la actualiza desde su hilo y la interfaz la lee desde el
+    hilo de Tk, por eso todos los accesos pasan por un candado.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Acumula el tiempo del bloque en la etapa dada"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        """Copia de las métricas actuales como diccionario serializable"""
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            rows = self.counters.get('filas', 0)
+            return {
+                'tiempo_total': round(elapsed, 4),
+                'filas_por_segundo': round(rows / elapsed, 2) if elapsed else 0.0,
+                'etapas': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                'contadores': dict(self.counters),
+            }
+
+    def summary_text(self):
+        """Resumen corto para la barra de estado"""
+        data = self.snapshot()
+        counters = data['contadores']
+        stages = data['etapas']
+        return (
+            f"{counters.get('filas', 0)} filas | {data['filas_por_segundo']:.1f} filas/s"
+            f" | {counters.get('bytes_escritos', 0) / (1024 * 1024):.1f} MB"
+            f" | {counters.get('variables_reemplazadas', 0)} variables"
+            f" | render {stages.get('render', 0.0):.1f} s"
+            f" | datos {stages.get('lectura_datos', 0.0) + stages.get('escritura_estado', 0.0):.1f} s"
+        )
+
+
+def metrics_logger(log_path):
+    """
+    Logger que escribe una línea JSON por corrida en log_path, rotando el
+    archivo al llegar a LOG_MAX_BYTES
+    """
+    log_path = os.path.abspath(log_path)
+    logger = logging.getLogger(f'contratos.metricas.{log_path}')
+    if not logger.handlers:
+        handler = RotatingFileHandler(
+            log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def log_metrics(metrics, output_dir, **context):
+    """
+    Agrega las métricas de una corrida al registro junto a la carpeta de salida
+    Args:
+        metrics (PipelineMetrics): Métricas de la corrida
+        output_dir (str): Carpeta de salida de los documentos
+        **context: Datos adicionales de la corrida (plantilla, procesos, ...)
+    """
+    entry = {'fecha': datetime.now().isoformat(timespec='seconds'), **context, **metrics.snapshot()}
+    log_path = os.path.join(_beside(output_dir), METRICS_LOG)
+    metrics_logger(log_path).info(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def profiled(mode, output_dir):
+    """
+    Perfila el bloque con cProfile ('cpu') o tracemalloc ('memoria') y
+    guarda el resultado junto a la carpeta de salida. Con mode=None no hace nada.
+
+    Solo cubre el proceso actual: con varios procesos de generación, el
+    render ocurre fuera del perfil.
+    """
+    if not mode:
+        yield None
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Modo de perfilado inválido: {mode}")
+
+    name = f"perfil_{os.path.basename(os.path.normpath(output_dir))}_{datetime.now():%Y%m%d_%H%M%S}"
+    if mode == 'cpu':
+        path = os.path.join(_beside(output_dir), name + '.prof')
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+    else:
+        path = os.path.join(_beside(output_dir), name + '.txt')
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        try:
+            yield path
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if not already_tracing:
+                tracemalloc.stop()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"Memoria actual: {current / 1024:.1f} KB | Pico: {peak / 1024:.1f} KB\n\n")
+                for stat in snapshot.statistics('lineno')[:MEMORY_TOP]:
+                    f.write(f"{stat}\n")
+
+
+def _beside(output_dir):
+    """Carpeta que contiene a la carpeta de salida"""
+    return os.path.dirname(os.path.abspath(output_dir))
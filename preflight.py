@@ -0,0 +1,153 @@
+# preflight.py
+"""
+Verificación previa de plantillas: compara sus variables con las columnas
+y el formulario del tipo de contrato, y revisa los registros pendientes,
+antes de lanzar una generación completa.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from data_manager import REQUIRED_FIELDS, get_columns
+from generator import GENERATED_FIELDS, STREAM_CHUNK_SIZE
+from schema import get_user_fields
+from storage import PENDING, RecordFilter
+from template_engine import scan_template
+
+# Columnas que llena el sistema y no se capturan en el formulario
+SYSTEM_COLUMNS = ('ID', 'FECHA_REGISTRO', 'GENERADO')
+
+# Plantillas que se leen a la vez
+PREFLIGHT_WORKERS = 8
+
+
+class TemplateCheck(NamedTuple):
+    """Resultado de verificar una plantilla"""
+    path: str
+    placeholders: list
+    # Variables sin columna ni valor calculado: quedarían como {{CLAVE}} en cada contrato
+    unknown: list
+    # Variables con columna pero sin campo en el formulario (solo por importación)
+    not_in_form: list
+    # Fragmentos con llaves que no forman una variable válida
+    malformed: list
+    # {campo: registros pendientes vacíos} de las variables usadas y los obligatorios
+    empty: dict
+    error: str = None
+
+    @property
+    def ok(self):
+        """False si la generación dejaría variables sin reemplazar o campos obligatorios vacíos"""
+        return not (
+            self.error or self.unknown or self.malformed
+            or any(self.empty.get(field) for field in REQUIRED_FIELDS)
+        )
+
+    def describe(self):
+        """Descripción de los problemas encontrados, una línea por tipo"""
+        if self.error:
+            return f"No se pudo leer la plantilla: {self.error}"
+        lines = []
+        if self.unknown:
+            lines.append(f"Variables sin columna: {', '.join(self.unknown)}")
+        if self.malformed:
+            lines.append(f"Variables mal escritas: {' | '.join(self.malformed[:5])}")
+        required = [f"{field} ({count})" for field, count in self.empty.items()
+                    if count and field in REQUIRED_FIELDS]
+        if required:
+            lines.append(f"Pendientes con obligatorios vacíos: {', '.join(required)}")
+        optional = [f"{field} ({count})" for field, count in self.empty.items()
+                    if count and field not in REQUIRED_FIELDS]
+        if optional:
+            lines.append(f"Pendientes con variables vacías: {', '.join(optional[:10])}")
+        if self.not_in_form:
+            lines.append(f"Variables sin campo en el formulario: {', '.join(self.not_in_form)}")
+        return "\n".join(lines) or "Sin problemas"
+
+
+def template_files(template_dir, contract_type):
+    """Plantillas .docx de plantillas_word/<tipo>, sin los archivos temporales de Word"""
+    return folder_templates(os.path.join(template_dir, contract_type))
+
+
+def folder_templates(folder):
+    """Plantillas .docx de una carpeta, sin los archivos temporales de Word"""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith('.docx') and not name.startswith('~$')
+    )
+
+
+def _scan(path):
+    try:
+        return scan_template(path) + (None,)
+    except Exception as e:
+        return [], [], str(e)
+
+
+def check_templates(data_manager, template_paths, workers=PREFLIGHT_WORKERS, stream=False):
+    """
+    Verifica varias plantillas a la vez contra el tipo de contrato actual.
+
+    Las plantillas se leen en hilos: el análisis del XML y la descompresión
+    liberan el GIL y no hay que esperar el arranque de procesos nuevos.
+    Los registros pendientes se revisan una sola vez, por columna.
+    Args:
+        data_manager (DataManager): Tipo de contrato y registros
+        template_paths (list): Rutas de las plantillas
+        workers (int): Plantillas leídas a la vez
+        stream (bool): Revisar los pendientes por bloques, solo con las columnas
+            necesarias, sin cargar la tabla (para la generación por bloques)
+    Returns:
+        list: TemplateCheck en el mismo orden que template_paths
+    """
+    template_paths = list(template_paths)
+    with ThreadPoolExecutor(max(1, min(workers, len(template_paths) or 1))) as pool:
+        scans = list(pool.map(_scan, template_paths))
+
+    contract_type = data_manager.contract_type
+    if stream:
+        pending = None
+        stored = data_manager.stored_columns()
+    else:
+        pending = data_manager.get_pending_records()
+        stored = pending.columns
+    form_fields = set(get_user_fields(contract_type))
+    # Un campo del formulario es una columna aunque el archivo aún no la tenga
+    columns = set(get_columns(contract_type)) | set(stored) | form_fields
+    known = columns | set(GENERATED_FIELDS)
+
+    # Vacíos por columna en todos los pendientes, de una vez para todas las plantillas
+    used = {key for placeholders, _, _ in scans for key in placeholders if key in columns}
+    fields = sorted(used | set(REQUIRED_FIELDS))
+    if stream:
+        chunks = data_manager.iter_records(RecordFilter(status=PENDING), fields, STREAM_CHUNK_SIZE)
+    else:
+        chunks = [pending]
+    empty_counts = dict.fromkeys(fields, 0)
+    for chunk in chunks:
+        text = chunk.reindex(columns=fields).fillna('').astype(str)
+        for field in fields:
+            empty_counts[field] += int(text[field].str.strip().eq('').sum())
+
+    checks = []
+    for path, (placeholders, malformed, error) in zip(template_paths, scans):
+        checks.append(TemplateCheck(
+            path=path,
+            placeholders=placeholders,
+            unknown=[key for key in placeholders if key not in known],
+            not_in_form=[
+                key for key in placeholders
+                if key in columns and key not in form_fields and key not in SYSTEM_COLUMNS
+            ],
+            malformed=malformed,
+            empty={
+                field: int(empty_counts[field])
+                for field in fields
+                if field in REQUIRED_FIELDS or field in placeholders
+            },
+            error=error
+        ))
+    return checks
@@ -0,0 +1,138 @@
+# schema.py
+# Widget de cada campo del formulario de captura: 'entry' o 'text', o un
+# diccionario por tipo de contrato cuando difiere.
+# Son los valores que captura el usuario; en los documentos se marcan con asteriscos.
+FORM_FIELDS = {
+    'NO_CONTRATO': 'entry',
+    'SERVICIOS': 'entry',
+    'BIENES': 'text',
+    'TITULAR_AREA_REQUIRENTE': 'entry',
+    'TITULAR_AREA': 'entry',
+    'PROVEEDOR': 'entry',
+    'NOM_PROVEEDOR': 'entry',
+    'CARGO_PROVEEDOR': 'entry',
+    'CARGO_AREA_REQUIRENTE': 'entry',
+    'FECHA_NOMBRAMIENTO': 'entry',
+    'FECHA_CELEBRACION': {'adquisiciones': 'text', 'servicios': 'entry'},
+    'FUNDAMENTO': 'text',
+    'NO_REQUISICION': 'text',
+    'TIPO_ADQUISICION': 'entry',
+    'ADQUISICION': 'text',
+    'NECESIDADES': {'adquisiciones': 'text', 'servicios': 'entry'},
+    'PARTIDA_DENOMINACION': 'entry',
+    'NO_OFICIO': 'entry',
+    'NO_ESCRITURA_PUBLICA': 'entry',
+    'FECHA_ESCRITURA_PUBLICA': 'entry',
+    'FECHA_PUBLICACION': 'entry',
+    'TITULAR_NOTARIA': 'entry',
+    'NO_NOTARIA': 'entry',
+    'NO_MERCANTIL': 'entry',
+    'ENTIDAD_FEDERATIVA': 'entry',
+    'INE_NOTARIA': 'entry',
+    'DIA': 'entry',
+    'OBJETO_SOCIAL': 'text',
+    'PERSONA_FISICA': 'entry',
+    'CARGO_PERSONA_FISICA': 'entry',
+    'CARGO_REPRESENTANTE': 'entry',
+    'CARACTER_PERSONA_FISICA': 'entry',
+    'IDENTIFICACION': 'entry',
+    'NO_DOCUMENTO': 'entry',
+    'INSTITUTO': 'entry',
+    'SEÑALAR_RELACION_CON': 'text',
+    'NACIONALIDAD': 'entry',
+    'NO_INE': 'entry',
+    'EXTRANJERO': 'entry',
+    'IDENTIFICACION2': 'entry',
+    'DENOMINACION': 'entry',
+    'OBJ_SOCIAL': 'text',
+    'FOLIO': 'entry',
+    'INSTITUCION': 'entry',
+    'FOLIO_REGISTRO_PROVEEDOR': 'entry',
+    'NO_ESCRITURA': 'entry',
+    'FECHA_PUBLICACION2': 'entry',
+    'INE_NOTARIO': 'entry',
+    'RFC': 'entry',
+    'NO_CONSTANCIA': 'entry',
+    'FECHA_CONSTANCIA': 'entry',
+    'FECHA_EXPEDICION': 'entry',
+    'ANEXOS': 'text',
+    'CONSTANCIAS': 'text',
+    'DOMICILIO': 'entry',
+    'NUMERO': 'entry',
+    'COLONIA': 'entry',
+    'ALCALDIA': 'entry',
+    'CP': 'entry',
+    'TELEFONOS': 'entry',
+    'CORREO': 'entry',
+    'CALLE': 'entry',
+    'NO_EXT': 'entry',
+    'DOMICILIO_CONTRATANTE': 'entry',
+    'SERVICIO_PROVEEDOR': 'entry',
+    'NO_SERV': 'entry',
+    'DESCRIPCION_ADQUISICION': {'adquisiciones': 'text', 'servicios': 'entry'},
+    'NO_REQUERIMIENTO': 'entry',
+    'PARTIDA_PRESUPUESTAL': 'entry',
+    'MONTO_AUTORIZADO': 'entry',
+    'CORREO_1': 'entry',
+    'CORREO_2': 'entry',
+    'NOM_COORDINADOR': 'entry',
+    'FECHA_ENTREGA': 'entry',
+    'FECHA_TERMINO': 'entry',
+    'FECHA_FIRMA': 'entry',
+    'FECHA_VIGENCIA_ENTREGA': 'entry',
+    'VIGENCIA_CONTRATO': 'entry',
+    'NO_PAG': 'entry',
+    'DIAS': 'entry',
+    'MES': 'entry',
+    'DIA_FIRMA': 'entry',
+    'MES_FIRMA': 'entry',
+    'DIRECCION_DE': 'entry',
+}
+
+# Orden de los campos en el formulario de cada tipo de contrato, el mismo
+# que conocen quienes capturan
+FORM_ORDER = {
+    'adquisiciones': (
+        'NO_CONTRATO', 'BIENES', 'TITULAR_AREA_REQUIRENTE', 'TITULAR_AREA', 'PROVEEDOR',
+        'NOM_PROVEEDOR', 'CARGO_PROVEEDOR', 'CARGO_AREA_REQUIRENTE', 'FECHA_NOMBRAMIENTO',
+        'FECHA_CELEBRACION', 'FUNDAMENTO', 'NO_REQUISICION', 'TIPO_ADQUISICION', 'ADQUISICION',
+        'NECESIDADES', 'PARTIDA_DENOMINACION', 'NO_OFICIO', 'NO_ESCRITURA_PUBLICA',
+        'FECHA_PUBLICACION', 'TITULAR_NOTARIA', 'NO_NOTARIA', 'NO_MERCANTIL', 'ENTIDAD_FEDERATIVA',
+        'DIA', 'OBJETO_SOCIAL', 'PERSONA_FISICA', 'CARACTER_PERSONA_FISICA', 'IDENTIFICACION',
+        'NO_DOCUMENTO', 'INSTITUCION', 'FOLIO_REGISTRO_PROVEEDOR', 'NO_ESCRITURA',
+        'FECHA_PUBLICACION2', 'INE_NOTARIO', 'RFC', 'NO_CONSTANCIA', 'FECHA_EXPEDICION', 'ANEXOS',
+        'CONSTANCIAS', 'DOMICILIO', 'NUMERO', 'COLONIA', 'ALCALDIA', 'CP', 'TELEFONOS', 'CORREO',
+        'CALLE', 'NO_EXT', 'DESCRIPCION_ADQUISICION', 'NO_REQUERIMIENTO', 'PARTIDA_PRESUPUESTAL',
+        'MONTO_AUTORIZADO', 'CORREO_1', 'CORREO_2', 'FECHA_ENTREGA', 'FECHA_VIGENCIA_ENTREGA',
+        'VIGENCIA_CONTRATO', 'NO_PAG', 'DIAS', 'MES', 'DIA_FIRMA', 'MES_FIRMA', 'DIRECCION_DE',
+    ),
+    'servicios': (
+        'NO_CONTRATO', 'SERVICIOS', 'TITULAR_AREA_REQUIRENTE', 'TITULAR_AREA', 'PROVEEDOR',
+        'NOM_PROVEEDOR', 'CARGO_PROVEEDOR', 'CARGO_AREA_REQUIRENTE', 'FECHA_NOMBRAMIENTO',
+        'TIPO_ADQUISICION', 'DESCRIPCION_ADQUISICION', 'NO_REQUERIMIENTO', 'NECESIDADES',
+        'PARTIDA_DENOMINACION', 'NO_OFICIO', 'NO_ESCRITURA_PUBLICA', 'FECHA_ESCRITURA_PUBLICA',
+        'TITULAR_NOTARIA', 'NO_NOTARIA', 'NO_MERCANTIL', 'ENTIDAD_FEDERATIVA', 'INE_NOTARIA', 'DIA',
+        'OBJETO_SOCIAL', 'PERSONA_FISICA', 'CARGO_PERSONA_FISICA', 'CARGO_REPRESENTANTE',
+        'IDENTIFICACION', 'NO_DOCUMENTO', 'INSTITUTO', 'SEÑALAR_RELACION_CON', 'NACIONALIDAD',
+        'NO_INE', 'EXTRANJERO', 'IDENTIFICACION2', 'DENOMINACION', 'OBJ_SOCIAL', 'FOLIO', 'RFC',
+        'NO_CONSTANCIA', 'FECHA_CONSTANCIA', 'ANEXOS', 'CONSTANCIAS', 'DOMICILIO', 'ALCALDIA', 'CP',
+        'TELEFONOS', 'CORREO', 'CALLE', 'NO_EXT', 'DOMICILIO_CONTRATANTE', 'SERVICIO_PROVEEDOR',
+        'NO_SERV', 'PARTIDA_PRESUPUESTAL', 'MONTO_AUTORIZADO', 'CORREO_1', 'CORREO_2',
+        'NOM_COORDINADOR', 'FECHA_ENTREGA', 'FECHA_TERMINO', 'FECHA_FIRMA', 'NO_PAG',
+        'FECHA_CELEBRACION', 'DIRECCION_DE',
+    ),
+}
+
+
+def get_form_fields(contract_type):
+    """Campos del formulario para un tipo de contrato: [(campo, widget), ...]"""
+    fields = []
+    for field in FORM_ORDER[contract_type]:
+        widget = FORM_FIELDS[field]
+        fields.append((field, widget[contract_type] if isinstance(widget, dict) else widget))
+    return fields
+
+
+def get_user_fields(contract_type):
+    """Nombres de los campos capturados por el usuario"""
+    return list(FORM_ORDER[contract_type])
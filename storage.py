@@ -0,0 +1,824 @@
+# storage.py
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from locking import FileLock
+
+# Registros por bloque al recorrer una consulta
+QUERY_CHUNK_SIZE = 1000
+
+# Espera máxima por el candado de escritura (s); reescribir un libro grande tarda
+WRITE_TIMEOUT = 120.0
+# Candado de escritura que se considera abandonado (s)
+STALE_LOCK = 600.0
+# Espera máxima por el candado del diario (s); solo se agregan líneas
+APPEND_TIMEOUT = 30.0
+# Lecturas repetidas si otro proceso escribe mientras se lee
+READ_RETRIES = 3
+
+# Estados de la columna GENERADO
+PENDING = 'No'
+GENERATED = 'Sí'
+
+# Clave de las líneas del diario de Excel que marcan IDs como generados
+MARKED_KEY = '_generados'
+
+
+class RecordFilter(NamedTuple):
+    """
+    Criterios de búsqueda de registros; los que quedan en None no filtran.
+    Los textos se buscan como subcadena, sin distinguir mayúsculas.
+    """
+    # PENDING o GENERATED
+    status: str = None
+    # FECHA_REGISTRO desde / hasta, días completos (date o 'AAAA-MM-DD')
+    date_from: object = None
+    date_to: object = None
+    # Texto dentro de NO_CONTRATO
+    contract_number: str = None
+    # Texto dentro de PROVEEDOR o NOM_PROVEEDOR
+    supplier: str = None
+    # Texto dentro de RFC
+    rfc: str = None
+
+    def columns(self):
+        """Columnas que se necesitan para aplicar el filtro"""
+        columns = []
+        if self.status is not None:
+            columns.append('GENERADO')
+        if self.date_from or self.date_to:
+            columns.append('FECHA_REGISTRO')
+        for names, _ in self._text_filters():
+            columns.extend(names)
+        return columns
+
+    def _text_filters(self):
+        return [
+            (columns, text) for columns, text in (
+                (('NO_CONTRATO',), self.contract_number),
+                (('PROVEEDOR', 'NOM_PROVEEDOR'), self.supplier),
+                (('RFC',), self.rfc),
+            ) if text
+        ]
+
+    def mask(self, df):
+        """Filas de df que cumplen los criterios, como Series booleana"""
+        mask = pd.Series(True, index=df.index)
+        if self.status is not None:
+            mask &= _column(df, 'GENERADO').astype(str) == self.status
+        if self.date_from or self.date_to:
+            dates = pd.to_datetime(_column(df, 'FECHA_REGISTRO'), errors='coerce')
+            if self.date_from:
+                mask &= dates >= pd.Timestamp(_day(self.date_from))
+            if self.date_to:
+                mask &= dates < pd.Timestamp(_day(self.date_to) + timedelta(days=1))
+        for columns, text in self._text_filters():
+            found = pd.Series(False, index=df.index)
+            for column in columns:
+                found |= _column(df, column).fillna('').astype(str).str.contains(text, case=False, regex=False)
+            mask &= found
+        return mask
+
+    def sql(self, available):
+        """
+        Condición WHERE equivalente para SQLite
+        Args:
+            available (iterable): Columnas de la tabla
+        Returns:
+            tuple: (condición, parámetros)
+        """
+        available = set(available)
+        clauses, params = [], []
+        if self.status is not None:
+            clauses.append('"GENERADO" = ?')
+            params.append(self.status)
+        # FECHA_REGISTRO se guarda como 'AAAA-MM-DD HH:MM:SS': se compara como texto
+        if self.date_from:
+            clauses.append('"FECHA_REGISTRO" >= ?')
+            params.append(_day(self.date_from).isoformat())
+        if self.date_to:
+            clauses.append('"FECHA_REGISTRO" < ?')
+            params.append((_day(self.date_to) + timedelta(days=1)).isoformat())
+        for columns, text in self._text_filters():
+            pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            options = [f"{_quote(column)} LIKE ? ESCAPE '\\'" for column in columns if column in available]
+            clauses.append(f"({' OR '.join(options)})" if options else '0')
+            params.extend([pattern] * len(options))
+        return ' AND '.join(clauses) or '1', params
+
+
+class StorageBackend:
+    """
+    Interfaz de almacenamiento de los registros de contratos.
+
+    Cada implementación guarda la misma tabla (una fila por contrato, con
+    las columnas de DataManager) y expone las mismas operaciones.
+
+    El DataFrame leído se conserva en memoria junto con la firma (mtime y
+    tamaño) de los archivos; solo se vuelve a leer si la firma cambia, por
+    ejemplo al editar el libro en Excel. Las escrituras propias actualizan
+    esa copia en lugar de descartarla.
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        self._cache = None
+        self._cache_signature = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Un escritor a la vez entre procesos y estaciones; las lecturas no lo usan
+        self.lock = FileLock(path + '.lock', timeout=WRITE_TIMEOUT, stale_after=STALE_LOCK)
+
+    def initialize(self):
+        """Crea el almacenamiento con la estructura inicial si no existe"""
+        raise NotImplementedError
+
+    def files(self):
+        """Archivos cuyo cambio invalida la caché"""
+        return (self.path,)
+
+    def signature(self):
+        """Firma (mtime, tamaño) de los archivos del almacenamiento"""
+        signature = []
+        for path in self.files():
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def load(self):
+        """
+        Devuelve todos los registros como DataFrame.
+        El resultado es la copia en caché: no debe modificarse.
+        """
+        signature = self.signature()
+        if self._cache is not None and signature == self._cache_signature:
+            self.cache_hits += 1
+            return self._cache
+        self.cache_misses += 1
+        # Sin candado: si los archivos cambian durante la lectura, se lee de nuevo
+        for _ in range(READ_RETRIES):
+            df = self._read()
+            current = self.signature()
+            if current == signature:
+                break
+            signature = current
+        else:
+            # Lectura posiblemente mezclada: sirve esta vez, pero no queda en caché
+            signature = None
+        self._cache = df
+        self._cache_signature = signature
+        return df
+
+    def _read(self):
+        """Lee todos los registros del disco"""
+        raise NotImplementedError
+
+    def _cache_is_current(self):
+        return self._cache is not None and self.signature() == self._cache_signature
+
+    def _update_cache(self, signature_before, update):
+        """
+        Aplica una escritura propia al DataFrame en caché.
+        Si los archivos habían cambiado por fuera, la caché se descarta.
+        """
+        if self._cache is not None and signature_before == self._cache_signature:
+            self._cache = update(self._cache)
+            self._cache_signature = self.signature()
+        else:
+            self._cache = None
+
+    def invalidate_cache(self):
+        self._cache = None
+
+    def query(self, record_filter=None, columns=None):
+        """
+        Registros que cumplen el filtro, solo con las columnas pedidas
+        Args:
+            record_filter (RecordFilter): Criterios; None devuelve todos
+            columns (list): Columnas del resultado (las que existan); None devuelve todas
+        Returns:
+            DataFrame
+        """
+        df = self.load()
+        if record_filter is not None:
+            df = df[record_filter.mask(df)]
+        return _project(df, columns)
+
+    def iter_query(self, record_filter=None, columns=None, chunk_size=QUERY_CHUNK_SIZE):
+        """
+        Igual que query(), en bloques de chunk_size registros. Las
+        implementaciones leen del disco bloque por bloque, sin usar ni llenar
+        la caché, para que la memoria no crezca con el tamaño de la tabla.
+        """
+        df = self.query(record_filter, columns)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+    def stored_columns(self):
+        """Columnas guardadas, sin leer los registros"""
+        if self._cache_is_current():
+            return list(self._cache.columns)
+        return self._read_columns()
+
+    def _read_columns(self):
+        return list(self.load().columns)
+
+    def append(self, records):
+        """Agrega registros (lista de diccionarios)"""
+        raise NotImplementedError
+
+    def mark_generated(self, record_ids):
+        """Marca como generados los registros con esos IDs (en texto)"""
+        raise NotImplementedError
+
+    def replace(self, df):
+        """Sustituye todo el contenido por el DataFrame dado"""
+        raise NotImplementedError
+
+    def compact(self):
+        """Consolida las escrituras pendientes, si la implementación las tiene"""
+
+
+class ExcelStorage(StorageBackend):
+    """
+    Registros en un libro de Excel (contratos_<tipo>.xlsx).
+
+    Los registros nuevos no reescriben el libro: se agregan a un diario
+    (contratos_<tipo>.journal.jsonl) que se lee junto con el libro y se
+    consolida en él en la siguiente escritura completa (replace o compact).
+    Hasta entonces no aparecen al abrir el Excel. mark_generated() tampoco
+    reescribe el libro: agrega al diario una línea con los IDs marcados
+    ({"_generados": [...]}), que se aplica al leer; la generación consolida
+    una sola vez al terminar.
+
+    Varias estaciones pueden compartir el libro en una carpeta de red: las
+    reescrituras se hacen de una en una con el candado del libro, y el
+    diario tiene su propio candado, que solo se toma un instante. Así una
+    captura no espera a que termine la reescritura del libro, y los
+    registros que llegan al diario mientras tanto se conservan.
+
+    compact() e iter_query() recorren el libro fila por fila (openpyxl en
+    modo de solo lectura y de solo escritura): la memoria no crece con el
+    tamaño del libro, aunque el tiempo de la consolidación sí.
+    """
+
+    def __init__(self, path, columns):
+        super().__init__(path, columns)
+        self.journal_path = os.path.splitext(path)[0] + '.journal.jsonl'
+        self.journal_lock = FileLock(self.journal_path + '.lock', timeout=APPEND_TIMEOUT)
+
+    def files(self):
+        return (self.path, self.journal_path)
+
+    def initialize(self):
+        if os.path.exists(self.path):
+            return
+        with self.lock:
+            # Otra estación pudo crearlo mientras se esperaba el candado
+            if not os.path.exists(self.path):
+                pd.DataFrame(columns=self.columns).to_excel(self.path, index=False, engine='openpyxl')
+
+    def _read(self):
+        # El ID se lee como texto: pandas convertiría los IDs numéricos a enteros
+        # y al reescribir el libro Excel los guardaría como double, perdiendo dígitos
+        df = pd.read_excel(self.path, engine='openpyxl', dtype={'ID': str})
+        journal, marked = self._read_journal()
+        if journal:
+            new_df = pd.DataFrame(journal)
+            # Tras una consolidación interrumpida el diario puede repetir filas del libro
+            if 'ID' in df.columns and 'ID' in new_df.columns:
+                new_df = new_df[~new_df['ID'].astype(str).isin(df['ID'].astype(str))]
+            df = pd.concat([df, new_df], ignore_index=True)
+        return _apply_marks(df, marked)
+
+    def query(self, record_filter=None, columns=None):
+        # Con columnas elegidas y sin caché vigente, se leen solo esas columnas del libro
+        if columns is None or self._cache_is_current():
+            return super().query(record_filter, columns)
+        chunks = list(self._stream(record_filter, columns, QUERY_CHUNK_SIZE))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(columns))
+
+    def iter_query(self, record_filter=None, columns=None, chunk_size=QUERY_CHUNK_SIZE):
+        return self._stream(record_filter, columns, chunk_size)
+
+    def _read_columns(self):
+        workbook = load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            header = next(workbook.active.iter_rows(max_row=1, values_only=True), ())
+        finally:
+            workbook.close()
+        columns = [f'Unnamed: {i}' if name is None else str(name) for i, name in enumerate(header)]
+        for record in self._read_journal()[0]:
+            columns.extend(key for key in record if key not in columns)
+        return columns
+
+    def _stream(self, record_filter, columns, chunk_size):
+        """
+        Lee el libro fila por fila (openpyxl en modo de solo lectura) y luego
+        el diario, en bloques de chunk_size filas con solo las columnas
+        necesarias; la memoria no crece con el tamaño del libro y la caché
+        no se toca.
+        """
+        needed = None
+        if columns is not None:
+            needed = set(columns) | {'ID'} | set(record_filter.columns() if record_filter else ())
+        # IDs del libro, para no repetir los del diario tras una consolidación interrumpida
+        seen = set()
+        # IDs marcados como generados en el diario (ver mark_generated)
+        marked = set()
+
+        def chunk(rows, names):
+            df = pd.DataFrame(rows, columns=names)
+            if 'ID' in df.columns:
+                df['ID'] = df['ID'].map(_id_text)
+                seen.update(df['ID'].dropna())
+            df = _apply_marks(df, marked)
+            if record_filter is not None:
+                df = df[record_filter.mask(df)]
+            return _project(df, columns).reset_index(drop=True)
+
+        # Se lee una copia: el libro no queda abierto mientras se guarda el estado
+        # (en Windows no se podría reemplazar) y la lectura no ve escrituras a medias.
+        # El libro y el diario se copian juntos con el candado del diario: una
+        # consolidación durante la lectura mueve registros del diario al libro
+        snapshot = _temp_copy(None, '.xlsx')
+        journal_snapshot = None
+        try:
+            with self.journal_lock:
+                shutil.copyfile(self.path, snapshot)
+                if os.path.exists(self.journal_path):
+                    journal_snapshot = _temp_copy(self.journal_path, '.jsonl')
+            yield from self._stream_snapshot(snapshot, journal_snapshot, chunk, needed, seen, marked,
+                                             chunk_size)
+        finally:
+            for path in (snapshot, journal_snapshot):
+                if path:
+                    os.remove(path)
+
+    def _stream_snapshot(self, snapshot, journal_snapshot, chunk, needed, seen, marked, chunk_size):
+        # Las marcas del diario se aplican también a las filas del libro: se leen
+        # antes (solo los IDs)
+        if journal_snapshot is not None:
+            with open(journal_snapshot, encoding='utf-8') as f:
+                for line in f:
+                    if MARKED_KEY in line and line.strip():
+                        marked.update(json.loads(line).get(MARKED_KEY, ()))
+        workbook = load_workbook(snapshot, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [f'Unnamed: {i}' if name is None else str(name)
+                      for i, name in enumerate(next(rows, ()))]
+            positions = [i for i, name in enumerate(header) if needed is None or name in needed]
+            names = [header[i] for i in positions]
+            batch = []
+            for row in rows:
+                values = [row[i] if i < len(row) else None for i in positions]
+                if all(value is None for value in values):
+                    continue
+                batch.append(values)
+                if len(batch) >= chunk_size:
+                    df = chunk(batch, names)
+                    batch = []
+                    if len(df):
+                        yield df
+            if batch:
+                df = chunk(batch, names)
+                if len(df):
+                    yield df
+        finally:
+            workbook.close()
+
+        def journal_chunk(records):
+            df = pd.DataFrame(records)
+            if needed is not None:
+                df = df[[column for column in df.columns if column in needed]]
+            return chunk(df.values.tolist(), list(df.columns))
+
+        if journal_snapshot is None:
+            return
+        batch = []
+        with open(journal_snapshot, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if MARKED_KEY in record or str(record.get('ID')) in seen:
+                    continue
+                batch.append(record)
+                if len(batch) >= chunk_size:
+                    df = journal_chunk(batch)
+                    batch = []
+                    if len(df):
+                        yield df
+        if batch:
+            df = journal_chunk(batch)
+            if len(df):
+                yield df
+
+    def _read_journal(self):
+        """
+        Returns:
+            tuple: (registros del diario, IDs marcados como generados en él)
+        """
+        records, marked = [], set()
+        if not os.path.exists(self.journal_path):
+            return records, marked
+        with open(self.journal_path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if MARKED_KEY in entry:
+                    marked.update(entry[MARKED_KEY])
+                else:
+                    records.append(entry)
+        return records, marked
+
+    def append(self, records):
+        lines = ''.join(
+            json.dumps(record, ensure_ascii=False, default=str) + '\n' for record in records
+        )
+        with self.journal_lock:
+            # La firma se toma con el candado: nadie más cambia los archivos hasta escribir
+            signature_before = self.signature()
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._update_cache(
+                signature_before,
+                lambda df: pd.concat([df, pd.DataFrame(records)], ignore_index=True)
+            )
+
+    def mark_generated(self, record_ids):
+        # Una línea en el diario en lugar de reescribir el libro; no espera a
+        # que termine una consolidación
+        line = json.dumps({MARKED_KEY: sorted(record_ids)}, ensure_ascii=False) + '\n'
+        with self.journal_lock:
+            signature_before = self.signature()
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._update_cache(signature_before, lambda df: _apply_marks(df, record_ids))
+
+    def _rewrite_book(self):
+        """
+        Reescribe el libro fila por fila, desde el disco, con los registros y
+        las marcas del diario consolidados; se llama con el candado del libro.
+        Solo los IDs quedan en memoria, no la tabla. Si la caché estaba
+        vigente se conserva (el contenido no cambia); si no, no se carga.
+        """
+        with self.journal_lock:
+            journal, marked = self._read_journal()
+        temp_path = os.path.splitext(self.path)[0] + '.tmp.xlsx'
+        written = set()
+        # IDs que quedan como generados en el libro: sus marcas ya no hacen falta
+        applied = set()
+        source = load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            rows = source.active.iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            names = [None if name is None else str(name) for name in header]
+            for key in dict.fromkeys(key for record in journal for key in record):
+                if key not in names:
+                    header.append(key)
+                    names.append(key)
+            id_position = names.index('ID') if 'ID' in names else None
+            status_position = names.index('GENERADO') if 'GENERADO' in names else None
+
+            target = Workbook(write_only=True)
+            sheet = target.create_sheet('Sheet1')
+            sheet.append(header)
+
+            def add(row):
+                if id_position is not None:
+                    # El ID se guarda como texto, igual que al leerlo (ver _read)
+                    record_id = row[id_position] = _id_text(row[id_position])
+                    written.add(str(record_id))
+                    if status_position is not None:
+                        if record_id in marked:
+                            row[status_position] = GENERATED
+                        if row[status_position] == GENERATED:
+                            applied.add(str(record_id))
+                sheet.append(row)
+
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                add(list(row) + [None] * (len(header) - len(row)))
+            # Tras una consolidación interrumpida el diario puede repetir filas del libro
+            for record in journal:
+                if str(record.get('ID')) not in written:
+                    add([record.get(name) for name in names])
+            target.save(temp_path)
+        finally:
+            source.close()
+        # Una marca leída sin su registro no tiene a qué aplicarse (el registro
+        # llega al diario antes que su marca)
+        applied |= marked - written
+
+        with self.journal_lock:
+            # Con la caché vigente (también con lo que llegó al diario durante la
+            # escritura) el contenido no cambia: basta con actualizar la firma
+            current = self._cache_is_current()
+            os.replace(temp_path, self.path)
+            self._trim_journal(written, applied)
+            if current:
+                self._cache_signature = self.signature()
+            else:
+                self._cache = None
+
+    def replace(self, df):
+        with self.lock:
+            self._write_book(df, keep_journal=False)
+
+    def compact(self):
+        with self.lock:
+            if os.path.exists(self.journal_path):
+                try:
+                    self._rewrite_book()
+                except Exception:
+                    # La caché ya no coincide con el disco
+                    self.invalidate_cache()
+                    raise
+
+    def _write_book(self, df, keep_journal=True):
+        """
+        Escribe el libro completo; se llama con el candado del libro.
+        Args:
+            df (DataFrame): Contenido del libro
+            keep_journal (bool): Conservar los registros del diario que no
+                están en df (los agregados durante la escritura); si es False
+                el diario se descarta
+        """
+        # Se escribe a un temporal para no dejar un libro a medias
+        temp_path = os.path.splitext(self.path)[0] + '.tmp.xlsx'
+        df.to_excel(temp_path, index=False, engine='openpyxl')
+        written = applied = None
+        if keep_journal:
+            written = set(df['ID'].astype(str)) if 'ID' in df.columns else set()
+            applied = set(df.loc[_column(df, 'GENERADO') == GENERATED, 'ID'].astype(str)) if written else set()
+        with self.journal_lock:
+            os.replace(temp_path, self.path)
+            remaining, marked = self._trim_journal(written, applied)
+            if remaining:
+                df = pd.concat([df, pd.DataFrame(remaining)], ignore_index=True)
+            self._cache = _apply_marks(df, marked)
+            self._cache_signature = self.signature()
+
+    def _trim_journal(self, written, applied):
+        """
+        Deja en el diario solo los registros cuyo ID no está en written y las
+        marcas de IDs que no están en applied (IDs en texto); con None lo
+        descarta completo. Se llama con el candado del diario.
+        Returns:
+            tuple: (registros, IDs marcados) que quedan en el diario
+        """
+        remaining, marked = [], set()
+        if written is not None:
+            records, marks = self._read_journal()
+            remaining = [record for record in records if str(record.get('ID')) not in written]
+            marked = marks - applied
+        if remaining or marked:
+            entries = remaining + ([{MARKED_KEY: sorted(marked)}] if marked else [])
+            temp_path = self.journal_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+            os.replace(temp_path, self.journal_path)
+        elif os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        return remaining, marked
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Registros en una base SQLite (contratos_<tipo>.db) con índices sobre
+    ID, GENERADO y NO_CONTRATO.
+
+    Las columnas clave se declaran TEXT para que los IDs importados desde
+    Excel como números se comparen igual que los capturados en el formulario;
+    el resto no tiene tipo y guarda los valores tal cual.
+    """
+
+    TABLE = 'contratos'
+    TEXT_COLUMNS = ('ID', 'GENERADO', 'NO_CONTRATO', 'FECHA_REGISTRO')
+
+    def _connect(self):
+        # timeout: con otro escritor activo, SQLite espera en lugar de fallar
+        return closing(sqlite3.connect(self.path, timeout=WRITE_TIMEOUT))
+
+    def initialize(self):
+        with self._connect() as conn, conn:
+            self._create_table(conn, self.columns)
+
+    def _create_table(self, conn, columns):
+        definitions = ', '.join(
+            f'{_quote(column)} TEXT' if column in self.TEXT_COLUMNS else _quote(column)
+            for column in columns
+        )
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {self.TABLE} ({definitions})')
+        for column in self.TEXT_COLUMNS:
+            if column in columns:
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS idx_{column.lower()} '
+                    f'ON {self.TABLE} ({_quote(column)})'
+                )
+
+    def _table_columns(self, conn):
+        return [row[1] for row in conn.execute(f'PRAGMA table_info({self.TABLE})')]
+
+    def _read(self):
+        with self._connect() as conn:
+            return pd.read_sql_query(f'SELECT * FROM {self.TABLE}', conn)
+
+    def _select(self, conn, record_filter, columns):
+        """SELECT con el filtro y las columnas pedidas que existen en la tabla"""
+        available = self._table_columns(conn)
+        where, params = (record_filter or RecordFilter()).sql(available)
+        selected = '*' if columns is None else ', '.join(
+            _quote(column) for column in dict.fromkeys(columns) if column in available
+        ) or '"ID"'
+        return f'SELECT {selected} FROM {self.TABLE} WHERE {where}', params
+
+    def query(self, record_filter=None, columns=None):
+        # Con la caché vigente se filtra en memoria; si no, se consulta con los índices
+        if self._cache_is_current():
+            return super().query(record_filter, columns)
+        with self._connect() as conn:
+            sql, params = self._select(conn, record_filter, columns)
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def _read_columns(self):
+        with self._connect() as conn:
+            return self._table_columns(conn)
+
+    def iter_query(self, record_filter=None, columns=None, chunk_size=QUERY_CHUNK_SIZE):
+        # Un bloque por consulta, continuando desde el último rowid: entre bloques
+        # no queda una lectura abierta que impida guardar el estado
+        last = 0
+        while True:
+            with self._connect() as conn:
+                sql, params = self._select(conn, record_filter, columns)
+                chunk = pd.read_sql_query(
+                    sql.replace('SELECT ', 'SELECT rowid AS "_rowid_", ', 1)
+                    + ' AND rowid > ? ORDER BY rowid LIMIT ?',
+                    conn, params=list(params) + [last, chunk_size]
+                )
+            if chunk.empty:
+                return
+            last = int(chunk['_rowid_'].iloc[-1])
+            yield chunk.drop(columns='_rowid_')
+
+    def append(self, records):
+        if not records:
+            return
+        with self.lock:
+            self._append(records)
+
+    def _append(self, records):
+        signature_before = self.signature()
+        with self._connect() as conn, conn:
+            existing = self._table_columns(conn)
+            # Igual que en Excel, los campos nuevos se agregan como columnas
+            for column in dict.fromkeys(key for record in records for key in record):
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE {self.TABLE} ADD COLUMN {_quote(column)}')
+                    existing.append(column)
+            for record in records:
+                columns = list(record)
+                conn.execute(
+                    f'INSERT INTO {self.TABLE} ({", ".join(map(_quote, columns))}) '
+                    f'VALUES ({", ".join("?" * len(columns))})',
+                    [_to_sql(record[column]) for column in columns]
+                )
+        self._update_cache(
+            signature_before,
+            lambda df: pd.concat([df, pd.DataFrame(records)], ignore_index=True)
+        )
+
+    def mark_generated(self, record_ids):
+        with self.lock:
+            signature_before = self.signature()
+            with self._connect() as conn, conn:
+                conn.executemany(
+                    f'UPDATE {self.TABLE} SET "GENERADO" = ? WHERE "ID" = ?',
+                    [(GENERATED, record_id) for record_id in record_ids]
+                )
+
+            def mark(df):
+                df.loc[df['ID'].astype(str).isin(record_ids), 'GENERADO'] = GENERATED
+                return df
+            self._update_cache(signature_before, mark)
+
+    def replace(self, df):
+        columns = list(dict.fromkeys(list(self.columns) + list(df.columns)))
+        rows = df.reindex(columns=columns).astype(object)
+        rows = rows.where(rows.notna(), None).values.tolist()
+        with self.lock, self._connect() as conn, conn:
+            conn.execute(f'DROP TABLE IF EXISTS {self.TABLE}')
+            self._create_table(conn, columns)
+            conn.executemany(
+                f'INSERT INTO {self.TABLE} VALUES ({", ".join("?" * len(columns))})',
+                [[_to_sql(value) for value in row] for row in rows]
+            )
+        self.invalidate_cache()
+
+
+def _temp_copy(path, suffix):
+    """Copia de path en un archivo temporal (vacío si path es None); devuelve su ruta"""
+    handle, temp_path = tempfile.mkstemp(suffix=suffix)
+    os.close(handle)
+    if path is not None:
+        shutil.copyfile(path, temp_path)
+    return temp_path
+
+
+def _apply_marks(df, marked):
+    """Pone GENERADO en los registros de df cuyo ID está en marked (IDs en texto)"""
+    if marked and 'ID' in df.columns and 'GENERADO' in df.columns:
+        df.loc[df['ID'].astype(str).isin(marked), 'GENERADO'] = GENERATED
+    return df
+
+
+def _project(df, columns):
+    """df con solo las columnas pedidas que existen (todas si columns es None)"""
+    if columns is None:
+        return df
+    return df[[column for column in dict.fromkeys(columns) if column in df.columns]]
+
+
+def _id_text(value):
+    """ID leído de una celda como texto, igual que read_excel con dtype str"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _column(df, name):
+    """Columna de df, o una vacía si no existe"""
+    return df[name] if name in df.columns else pd.Series('', index=df.index)
+
+
+def _day(value):
+    """Fecha (sin hora) a partir de date, datetime o texto 'AAAA-MM-DD'"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+
+
+def _quote(identifier):
+    """Nombre de columna entre comillas para SQL"""
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def _to_sql(value):
+    """Convierte valores de pandas a tipos que acepta sqlite3"""
+    if value is None:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat(sep=' ')
+    if hasattr(value, 'item'):
+        # Escalares de numpy
+        return value.item()
+    return value
+
+
+if __name__ == "__main__":
+    import argparse
+    from data_manager import DataManager
+
+    parser = argparse.ArgumentParser(
+        description="Importa o exporta los registros entre el Excel y la base SQLite"
+    )
+    parser.add_argument('accion', choices=['importar', 'exportar'])
+    parser.add_argument('tipo', choices=['adquisiciones', 'servicios'])
+    parser.add_argument('--excel', help="Ruta del Excel (por defecto contratos_<tipo>.xlsx)")
+    args = parser.parse_args()
+
+    dm = DataManager(args.tipo, backend='sqlite')
+    if args.accion == 'importar':
+        if not os.path.exists(args.excel or dm.excel_file):
+            parser.error(f"No existe el archivo {args.excel or dm.excel_file}")
+        total = dm.import_from_excel(args.excel)
+        print(f"Importados {total} registros en {dm.storage.path}")
+    else:
+        total = dm.export_to_excel(args.excel)
+        print(f"Exportados {total} registros a {args.excel or dm.excel_file}")
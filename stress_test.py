@@ -0,0 +1,215 @@
+# stress_test.py
+"""
+Prueba de escrituras concurrentes sobre los archivos de contratos.
+
+Lanza varios procesos que guardan registros a la vez con DataManager, como
+varias estaciones de captura sobre la misma carpeta compartida, y que
+marcan como generados los suyos por lotes. Al terminar verifica que no se
+perdió ni se repitió ningún registro ni ninguna marca, también después de
+consolidar el diario en el libro, e informa el rendimiento alcanzado:
+
+    python stress_test.py
+    python stress_test.py --procesos 16 --registros 100 --backend sqlite --salida stress.json
+
+Trabaja en un directorio temporal; termina con código 1 si hubo pérdidas.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmark import percentile, synthetic_record
+from data_manager import DataManager, get_columns
+from storage import GENERATED
+
+
+def station(work_dir, contract_type, backend, number, records, mark_every, barrier, results):
+    """Una estación de captura: guarda sus registros y marca lotes como generados"""
+    os.chdir(work_dir)
+    data_manager = DataManager(contract_type, backend=backend)
+    columns = get_columns(contract_type)
+    rng = random.Random(number)
+    saved, marked, errors = [], [], []
+    save_latencies, mark_latencies = [], []
+
+    barrier.wait()
+    for i in range(records):
+        record = synthetic_record(columns, number * 1000000 + i, rng)
+        for field in ('ID', 'FECHA_REGISTRO', 'GENERADO'):
+            record.pop(field, None)
+        record['NO_CONTRATO'] = f"EST{number:03d}-{i:06d}"
+
+        started = time.perf_counter()
+        success, message = data_manager.save_record(record)
+        save_latencies.append(time.perf_counter() - started)
+        if not success:
+            errors.append(message)
+            continue
+        saved.append(record['ID'])
+
+        if mark_every and len(saved) % mark_every == 0:
+            batch = saved[-mark_every:]
+            started = time.perf_counter()
+            if data_manager.mark_many_as_generated(batch):
+                marked.extend(batch)
+            else:
+                errors.append(f"No se marcaron {len(batch)} registros")
+            mark_latencies.append(time.perf_counter() - started)
+
+    results.put({
+        'station': number,
+        'saved': saved,
+        'marked': marked,
+        'errors': errors,
+        'save_latencies': save_latencies,
+        'mark_latencies': mark_latencies,
+    })
+
+
+def latency_stats(latencies):
+    """p50/p99 y media en milisegundos"""
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'n': 0}
+    return {
+        'n': len(latencies),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+    }
+
+
+def verify(contract_type, backend, saved, marked):
+    """
+    Compara lo que las estaciones guardaron y marcaron con lo que quedó en disco
+    Returns:
+        dict: Registros perdidos, repetidos y marcas perdidas
+    """
+    # Un DataManager nuevo: nada de la caché de las estaciones
+    df = DataManager(contract_type, backend=backend).load_data()
+    ids = df['ID'].astype(str)
+    generated = set(ids[df['GENERADO'] == GENERATED])
+    return {
+        'registros': len(df),
+        'perdidos': len(set(saved) - set(ids)),
+        'repetidos': int(ids.duplicated().sum()),
+        'marcas_perdidas': len(set(marked) - generated),
+    }
+
+
+def run(contract_type, backend, processes, records, mark_every):
+    """Corre las estaciones en el directorio actual y devuelve el reporte"""
+    DataManager(contract_type, backend=backend)
+    barrier = multiprocessing.Barrier(processes + 1)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=station,
+            args=(os.getcwd(), contract_type, backend, number, records, mark_every, barrier, results)
+        )
+        for number in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    reports = [results.get() for _ in workers]
+    elapsed = time.perf_counter() - started
+    for worker in workers:
+        worker.join()
+
+    saved = [record_id for report in reports for record_id in report['saved']]
+    marked = [record_id for report in reports for record_id in report['marked']]
+    errors = [error for report in reports for error in report['errors']]
+    before = verify(contract_type, backend, saved, marked)
+
+    started_compact = time.perf_counter()
+    DataManager(contract_type, backend=backend).compact()
+    compact_seconds = time.perf_counter() - started_compact
+    after = verify(contract_type, backend, saved, marked)
+
+    return {
+        'tipo': contract_type,
+        'backend': backend,
+        'procesos': processes,
+        'registros_por_proceso': records,
+        'marcar_cada': mark_every,
+        'guardados': len(saved),
+        'marcados': len(marked),
+        'errores': len(errors),
+        'ejemplos_error': errors[:5],
+        'segundos': elapsed,
+        'guardados_por_segundo': len(saved) / elapsed if elapsed else None,
+        'guardar': latency_stats([t for report in reports for t in report['save_latencies']]),
+        'marcar': latency_stats([t for report in reports for t in report['mark_latencies']]),
+        'verificacion': before,
+        'consolidacion_segundos': compact_seconds,
+        'verificacion_consolidado': after,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de escrituras concurrentes de DataManager")
+    parser.add_argument('--procesos', type=int, default=8, help="Estaciones guardando a la vez")
+    parser.add_argument('--registros', type=int, default=50, help="Registros por estación")
+    parser.add_argument('--marcar-cada', type=int, default=10,
+                        help="Cada estación marca como generados sus registros en lotes de este tamaño (0 = nunca)")
+    parser.add_argument('--tipo', choices=['adquisiciones', 'servicios'], default='servicios')
+    parser.add_argument('--backend', choices=['excel', 'sqlite'], default='excel')
+    parser.add_argument('--salida', help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    original_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='stress_contratos_')
+    os.chdir(work_dir)
+    try:
+        report = run(args.tipo, args.backend, max(1, args.procesos), args.registros, args.marcar_cada)
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    save, mark = report['guardar'], report['marcar']
+    print(f"{report['procesos']} procesos x {report['registros_por_proceso']} registros ({report['backend']})")
+    print(f"Guardados: {report['guardados']} en {report['segundos']:.2f} s "
+          f"({report['guardados_por_segundo'] or 0:.1f}/s) | Errores: {report['errores']}")
+    if save['n']:
+        print(f"Guardar: p50={save['p50_ms']:.1f} ms  p99={save['p99_ms']:.1f} ms")
+    if mark['n']:
+        print(f"Marcar:  p50={mark['p50_ms']:.1f} ms  p99={mark['p99_ms']:.1f} ms  ({report['marcados']} marcados)")
+    for label, check in (("Antes de consolidar", report['verificacion']),
+                         ("Después de consolidar", report['verificacion_consolidado'])):
+        print(f"{label}: {check['registros']} registros, {check['perdidos']} perdidos, "
+              f"{check['repetidos']} repetidos, {check['marcas_perdidas']} marcas perdidas")
+    for error in report['ejemplos_error']:
+        print(f"  {error}", file=sys.stderr)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'fecha': datetime.now().isoformat(timespec='seconds'),
+                    'python': platform.python_version(),
+                    'plataforma': platform.platform(),
+                    'cpus': os.cpu_count(),
+                },
+                'results': report,
+            }, f, ensure_ascii=False, indent=1)
+        print(f"Resultados guardados en {args.salida}")
+
+    lost = any(
+        check['perdidos'] or check['repetidos'] or check['marcas_perdidas']
+        for check in (report['verificacion'], report['verificacion_consolidado'])
+    )
+    return 1 if lost else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
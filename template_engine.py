@@ -0,0 +1,448 @@
+# template_engine.py
+import copy
+import os
+import re
+from bisect import bisect_right
+from itertools import accumulate
+import struct
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.oxml import serialize_part_xml
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import qn
+
+# Marcador de variable en las plantillas: {{CLAVE}}
+PLACEHOLDER_RE = re.compile(r'\{\{(\w+)\}\}')
+
+# Delimitadores internos del modo rápido (caracteres de uso privado)
+_SENTINEL_OPEN = '\ue000'
+_SENTINEL_CLOSE = '\ue001'
+_SENTINEL_RE = re.compile(f'{_SENTINEL_OPEN}(\\w+){_SENTINEL_CLOSE}')
+
+# Partes del paquete que pueden contener variables, además del cuerpo
+TEXT_PART_TYPES = {CT.WML_HEADER, CT.WML_FOOTER, CT.WML_FOOTNOTES, CT.WML_ENDNOTES, CT.WML_COMMENTS}
+
+# Llaves dobles sueltas, con algo de contexto, para señalar variables mal escritas
+_MALFORMED_RE = re.compile(r'.{0,20}(?:\{\{|\}\}).{0,20}')
+
+_W_P = qn('w:p')
+_W_T = qn('w:t')
+_XML_SPACE = qn('xml:space')
+
+# Tabuladores y saltos de línea dentro de un valor: se escriben como w:tab y
+# w:br, igual que python-docx
+_BREAK_RE = re.compile(r'([\t\n\r])')
+_RUN_BREAKS = str.maketrans({
+    '\t': '</w:t><w:tab/><w:t xml:space="preserve">',
+    '\n': '</w:t><w:br/><w:t xml:space="preserve">',
+    '\r': '</w:t><w:br/><w:t xml:space="preserve">',
+})
+
+# Caracteres fuera del rango Char de XML 1.0 (controles como \x0b o \x0c que
+# llegan al copiar de Excel): un documento con ellos no se puede abrir
+_INVALID_XML_RE = re.compile('[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+
+# Plantillas compiladas: {(ruta absoluta, modo rápido): (mtime, plantilla)}
+_template_cache = {}
+
+
+class CompiledTemplate:
+    """
+    Plantilla Word analizada una sola vez.
+
+    Guarda, por cada parte XML con variables (ver text_parts), la copia
+    original del árbol y la posición de cada párrafo que contiene variables,
+    de modo que cada contrato se obtiene de una copia profunda de esa parte
+    y de la sustitución directa en esos párrafos, sin volver a recorrer la
+    plantilla completa.
+
+    No es reentrante: render() reutiliza el mismo paquete para guardar.
+    """
+
+    def __init__(self, template_path):
+        self.template_path = template_path
+        self.document = Document(template_path)
+        self._parts = []
+        self._compile()
+
+    def _compile(self):
+        """Registra la posición de los párrafos con variables en cada parte"""
+        for part, root, spots in find_placeholder_paragraphs(self.document):
+            spots = [(_element_path(p), keys) for p, keys in spots]
+            self._parts.append((part, copy.deepcopy(root), spots))
+
+    @property
+    def placeholders(self):
+        """Conjunto de variables presentes en la plantilla"""
+        return {key for _, _, spots in self._parts for _, keys in spots for key in keys}
+
+    def render(self, replacements, output):
+        """
+        Genera un documento con los valores dados
+        Args:
+            replacements (dict): Valores por nombre de variable
+            output (str | file): Ruta o archivo binario de salida
+        Returns:
+            int: Variables reemplazadas
+        """
+        replaced = 0
+        for part, pristine, spots in self._parts:
+            root = copy.deepcopy(pristine)
+            for path, _ in spots:
+                replaced += substitute_paragraph(_resolve_path(root, path), replacements)
+            _store_root(part, root)
+        self.document.save(output)
+        return replaced
+
+
+class FastTemplate:
+    """
+    Plantilla para el modo rápido: trabaja directamente sobre el zip.
+
+    Las partes sin variables se guardan ya comprimidas y las partes XML con
+    variables se dividen en fragmentos alrededor de cada {{CLAVE}}; cada
+    contrato se escribe como un zip nuevo a partir de esos bytes y de los
+    valores escapados de la fila. El texto resultante es el mismo que el de
+    CompiledTemplate.render().
+    """
+
+    def __init__(self, template_path):
+        self.template_path = template_path
+        self._entries = []
+        self._compile()
+
+    def _compile(self):
+        document = Document(self.template_path)
+        fragments = {}
+        for part, root, spots in find_placeholder_paragraphs(document):
+            root = copy.deepcopy(root)
+            for p, keys in spots:
+                # Cada variable queda como un delimitador dentro del w:t donde empieza
+                substitute_paragraph(
+                    _resolve_path(root, _element_path(p)),
+                    {key: f'{_SENTINEL_OPEN}{key}{_SENTINEL_CLOSE}' for key in keys}
+                )
+            xml = serialize_part_xml(root).decode('utf-8')
+            pieces = _SENTINEL_RE.split(xml)
+            pieces[::2] = [piece.encode('utf-8') for piece in pieces[::2]]
+            fragments[part.partname.lstrip('/')] = pieces
+
+        with zipfile.ZipFile(self.template_path) as source:
+            for info in source.infolist():
+                data = source.read(info.filename)
+                pieces = fragments.get(info.filename)
+                if pieces is None:
+                    self._entries.append(_ZipEntry(info, data))
+                else:
+                    self._entries.append(_ZipEntry(info, None, pieces))
+
+    @property
+    def placeholders(self):
+        """Conjunto de variables presentes en la plantilla"""
+        return {
+            key
+            for entry in self._entries if entry.pieces
+            for key in entry.pieces[1::2]
+        }
+
+    def render(self, replacements, output):
+        """
+        Genera un documento con los valores dados
+        Args:
+            replacements (dict): Valores por nombre de variable
+            output (str | file): Ruta o archivo binario de salida
+        Returns:
+            int: Variables reemplazadas
+        """
+        chunks = []
+        central = []
+        offset = 0
+        replaced = 0
+        for entry in self._entries:
+            if entry.pieces is None:
+                crc, size, compressed = entry.crc, entry.size, entry.compressed
+            else:
+                replaced += sum(1 for key in entry.pieces[1::2] if key in replacements)
+                data = entry.fill(replacements)
+                crc, size = zlib.crc32(data), len(data)
+                compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+                compressed = compressor.compress(data) + compressor.flush()
+            header = struct.pack(
+                '<4s5H3L2H', b'PK\x03\x04', 20, entry.flags, zipfile.ZIP_DEFLATED,
+                entry.time, entry.date, crc, len(compressed), size, len(entry.name), 0
+            )
+            chunks += [header, entry.name, compressed]
+            central.append(struct.pack(
+                '<4s6H3L5H2L', b'PK\x01\x02', 20, 20, entry.flags, zipfile.ZIP_DEFLATED,
+                entry.time, entry.date, crc, len(compressed), size, len(entry.name),
+                0, 0, 0, 0, 0, offset
+            ) + entry.name)
+            offset += len(header) + len(entry.name) + len(compressed)
+        central_size = sum(len(record) for record in central)
+        chunks += central
+        chunks.append(struct.pack(
+            '<4s4H2LH', b'PK\x05\x06', 0, 0, len(central), len(central),
+            central_size, offset, 0
+        ))
+        payload = b''.join(chunks)
+        if hasattr(output, 'write'):
+            output.write(payload)
+        else:
+            with open(output, 'wb') as f:
+                f.write(payload)
+        return replaced
+
+
+class _ZipEntry:
+    """Entrada del zip de salida: bytes comprimidos fijos o fragmentos XML"""
+
+    def __init__(self, info, data, pieces=None):
+        self.name = info.filename.encode('utf-8')
+        # Bit 11: nombre codificado en UTF-8
+        self.flags = 0x800 if info.flag_bits & 0x800 else 0
+        year, month, day, hour, minute, second = info.date_time
+        self.date = (year - 1980) << 9 | month << 5 | day
+        self.time = hour << 11 | minute << 5 | second // 2
+        self.pieces = pieces
+        if data is not None:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+            self.compressed = compressor.compress(data) + compressor.flush()
+            self.crc, self.size = zlib.crc32(data), len(data)
+
+    def fill(self, replacements):
+        """Une los fragmentos con los valores escapados de la fila"""
+        pieces = self.pieces
+        out = [pieces[0]]
+        for i in range(1, len(pieces), 2):
+            key = pieces[i]
+            if key in replacements:
+                out.append(_escape_run_text(str(replacements[key])))
+            else:
+                out.append(f'{{{{{key}}}}}'.encode('utf-8'))
+            out.append(pieces[i + 1])
+        return b''.join(out)
+
+
+def _escape_run_text(text):
+    """Escapa texto para insertarlo dentro de un w:t, igual que python-docx"""
+    return escape(check_xml_text(text)).translate(_RUN_BREAKS).encode('utf-8')
+
+
+def check_xml_text(text):
+    """
+    Devuelve el texto si puede escribirse en el XML del documento; si no,
+    lanza ValueError (el registro falla en lugar de dar un documento dañado)
+    """
+    match = _INVALID_XML_RE.search(text)
+    if match:
+        raise ValueError(
+            f"Carácter no válido en un documento Word ({match.group(0)!r}) en el valor {text[:40]!r}"
+        )
+    return text
+
+
+def substitute_paragraph(p, replacements):
+    """
+    Reemplaza las variables de un párrafo en una sola pasada, conservando
+    el formato de los runs.
+
+    Word suele repartir una variable en varios runs ("{{MON" en negritas y
+    "TO}}" normal), así que se busca sobre el texto unido de los w:t y solo
+    se editan los que contienen cada coincidencia: el valor queda en el run
+    donde empieza la variable y el resto de la variable se borra de los
+    siguientes. Los demás runs no se tocan.
+    Args:
+        p: Elemento w:p
+        replacements (dict): Valores por nombre de variable; las que no están se dejan igual
+    Returns:
+        int: Variables reemplazadas
+    """
+    nodes = _paragraph_nodes(p)
+    texts = [t.text or '' for t in nodes]
+    joined = ''.join(texts)
+    matches = [m for m in PLACEHOLDER_RE.finditer(joined) if m.group(1) in replacements]
+    if not matches:
+        return 0
+
+    ends = list(accumulate(len(text) for text in texts))
+    starts = [end - len(text) for end, text in zip(ends, texts)]
+    changed = set()
+    # De derecha a izquierda, para que las posiciones pendientes sigan valiendo
+    for match in reversed(matches):
+        first = bisect_right(ends, match.start())
+        last = bisect_right(ends, match.end() - 1)
+        head = texts[first][:match.start() - starts[first]]
+        tail = texts[last][match.end() - starts[last]:]
+        value = check_xml_text(str(replacements[match.group(1)]))
+        if first == last:
+            texts[first] = head + value + tail
+        else:
+            texts[first] = head + value
+            for i in range(first + 1, last):
+                texts[i] = ''
+            texts[last] = tail
+        changed.update(range(first, last + 1))
+
+    for i in changed:
+        _set_run_text(nodes[i], texts[i])
+    return len(matches)
+
+
+def _paragraph_nodes(p):
+    """w:t propios del párrafo: un cuadro de texto dentro de él tiene sus propios w:p"""
+    return [t for t in p.iter(_W_T) if next(t.iterancestors(_W_P)) is p]
+
+
+def _set_run_text(t, text):
+    """Escribe el texto en un w:t, con w:tab y w:br para tabuladores y saltos de línea"""
+    # El valor puede empezar o terminar en espacio
+    t.set(_XML_SPACE, 'preserve')
+    pieces = _BREAK_RE.split(text)
+    t.text = pieces[0]
+    anchor = t
+    for i in range(1, len(pieces), 2):
+        brk = OxmlElement('w:tab' if pieces[i] == '\t' else 'w:br')
+        anchor.addnext(brk)
+        anchor = OxmlElement('w:t')
+        anchor.set(_XML_SPACE, 'preserve')
+        anchor.text = pieces[i + 1]
+        brk.addnext(anchor)
+
+
+def text_parts(document):
+    """
+    Partes del paquete con texto: el cuerpo, todos los encabezados y pies
+    (predeterminados, de primera página y de páginas pares), notas al pie,
+    notas finales y comentarios. Cada parte aparece una sola vez aunque
+    varias secciones la compartan.
+    """
+    parts = [document.part]
+    for part in document.part.package.iter_parts():
+        if part.content_type in TEXT_PART_TYPES:
+            parts.append(part)
+    return parts
+
+
+def find_placeholder_paragraphs(document):
+    """
+    Localiza los párrafos con variables en todas las partes con texto.
+
+    Se recorren todos los w:p del árbol de cada parte, así que cada párrafo
+    se visita una sola vez, incluidos los de tablas anidadas, celdas
+    combinadas y cuadros de texto.
+    Returns:
+        list: [(parte, raíz XML, [(elemento w:p, claves), ...]), ...] solo con partes que tienen variables
+    """
+    found = []
+    for part in text_parts(document):
+        root = _part_root(part)
+        spots = []
+        for p in root.iter(_W_P):
+            text = ''.join(t.text or '' for t in _paragraph_nodes(p))
+            keys = tuple(dict.fromkeys(PLACEHOLDER_RE.findall(text)))
+            if keys:
+                spots.append((p, keys))
+        if spots:
+            found.append((part, root, spots))
+    return found
+
+
+def scan_template(template_path):
+    """
+    Lee las variables de una plantilla sin generar nada, en una sola pasada
+    por todas sus partes con texto
+    Returns:
+        tuple: (variables en orden de aparición, fragmentos con llaves que no forman {{CLAVE}})
+    """
+    placeholders = {}
+    malformed = []
+    for part in text_parts(Document(template_path)):
+        for p in _part_root(part).iter(_W_P):
+            text = ''.join(t.text or '' for t in _paragraph_nodes(p))
+            if '{' not in text and '}' not in text:
+                continue
+            placeholders.update(dict.fromkeys(PLACEHOLDER_RE.findall(text)))
+            # Lo que queda con llaves dobles tras quitar las variables válidas: {{ CLAVE}}, {CLAVE}}, ...
+            rest = PLACEHOLDER_RE.sub('', text)
+            for match in _MALFORMED_RE.finditer(rest):
+                malformed.append(match.group(0).strip())
+    return list(placeholders), malformed
+
+
+def _part_root(part):
+    """Raíz XML de una parte; las que python-docx no analiza (notas) se leen del blob"""
+    if hasattr(part, '_element'):
+        return part._element
+    return parse_xml(part.blob)
+
+
+def _store_root(part, root):
+    """Sustituye el contenido de una parte por el árbol dado"""
+    if hasattr(part, '_element'):
+        part._element = root
+    else:
+        part._blob = serialize_part_xml(root)
+
+
+def _element_path(element):
+    """Índices de hijo desde la raíz de la parte hasta el elemento"""
+    path = []
+    parent = element.getparent()
+    while parent is not None:
+        path.append(parent.index(element))
+        element, parent = parent, parent.getparent()
+    return tuple(reversed(path))
+
+
+def _resolve_path(root, path):
+    element = root
+    for index in path:
+        element = element[index]
+    return element
+
+
+def replace_template_content(doc, replacements):
+    """
+    Realiza el reemplazo de variables en toda la plantilla, sobre un
+    Document de python-docx ya abierto (sin compilar). Recorre una sola vez
+    cada párrafo de cada parte con texto (ver text_parts).
+    Returns:
+        int: Variables reemplazadas
+    """
+    replaced = 0
+    for part in text_parts(doc):
+        root = _part_root(part)
+        count = sum(substitute_paragraph(p, replacements) for p in list(root.iter(_W_P)))
+        if count:
+            _store_root(part, root)
+        replaced += count
+    return replaced
+
+
+def replace_in_header_footer(header_footer, replacements):
+    """Reemplaza contenido en un encabezado o pie de página, con sus tablas y cuadros de texto"""
+    return sum(
+        substitute_paragraph(p, replacements)
+        for p in list(header_footer.part.element.iter(_W_P))
+    )
+
+
+def compile_template(template_path, fast=False):
+    """
+    Devuelve la plantilla compilada, reutilizando la caché si el archivo no cambió
+    Args:
+        template_path (str): Ruta de la plantilla .docx
+        fast (bool): Usar el modo rápido sobre el zip (FastTemplate)
+    """
+    path = os.path.abspath(template_path)
+    mtime = os.path.getmtime(path)
+    cached = _template_cache.get((path, fast))
+    if cached and cached[0] == mtime:
+        return cached[1]
+    compiled = FastTemplate(path) if fast else CompiledTemplate(path)
+    _template_cache[(path, fast)] = (mtime, compiled)
+    return compiled
@@ -0,0 +1,79 @@
+# tests/test_formatting.py
+import pandas as pd
+import pytest
+
+import formatting
+from formatting import amount_in_words, format_records, number_to_words
+
+
+@pytest.mark.parametrize('number, words', [
+    (0, 'CERO'),
+    (1, 'UN'),
+    (21, 'VEINTIÚN'),
+    (100, 'CIEN'),
+    (101, 'CIENTO UN'),
+    (1501, 'MIL QUINIENTOS UN'),
+    (1000000, 'UN MILLÓN'),
+    (2500000, 'DOS MILLONES QUINIENTOS MIL'),
+    (1000000000, 'MIL MILLONES'),
+    (1000000000000, 'UN BILLÓN'),
+    (2000000000005, 'DOS BILLONES CINCO'),
+    (-5, 'MENOS CINCO'),
+    (-1000000, 'MENOS UN MILLÓN'),
+])
+def test_number_to_words(number, words):
+    assert number_to_words(number) == words
+
+
+@pytest.mark.parametrize('cents, words', [
+    (0, 'CERO PESOS 00/100 M.N.'),
+    (1, 'CERO PESOS 01/100 M.N.'),
+    (100, 'UN PESO 00/100 M.N.'),
+    (150050, 'MIL QUINIENTOS PESOS 50/100 M.N.'),
+    (100000000, 'UN MILLÓN DE PESOS 00/100 M.N.'),
+    (123456789, 'UN MILLÓN DOSCIENTOS TREINTA Y CUATRO MIL QUINIENTOS SESENTA Y SIETE PESOS 89/100 M.N.'),
+    (-150050, 'MENOS MIL QUINIENTOS PESOS 50/100 M.N.'),
+    (-99, 'MENOS CERO PESOS 99/100 M.N.'),
+])
+def test_amount_in_words(cents, words):
+    assert amount_in_words(cents) == words
+
+
+def test_format_records_amounts():
+    df = pd.DataFrame({'MONTO_AUTORIZADO': ['1,500.50', '-100', 'inf', 'nan', 'abc', None, 1500.0]})
+    result = format_records(df)
+    assert result['MONTO_AUTORIZADO'].tolist() == [
+        '$1,500.50', '-$100.00', 'inf', 'nan', 'abc', '', '$1,500.00'
+    ]
+    assert result['MONTO_LETRA'].tolist() == [
+        'MIL QUINIENTOS PESOS 50/100 M.N.', 'MENOS CIEN PESOS 00/100 M.N.',
+        '', '', '', '', 'MIL QUINIENTOS PESOS 00/100 M.N.'
+    ]
+
+
+def test_format_records_dates():
+    df = pd.DataFrame({'FECHA_ENTREGA': ['2025-03-15', '15/03/2025', 'pendiente', None]})
+    assert format_records(df)['FECHA_ENTREGA'].tolist() == [
+        '15 de marzo de 2025', '15 de marzo de 2025', 'pendiente', ''
+    ]
+
+
+def test_format_records_errors_per_row(monkeypatch):
+    def failing(series):
+        if (series == 'malo').any():
+            raise ValueError('valor inválido')
+        return series.str.upper()
+
+    monkeypatch.setitem(formatting.FORMATTERS, 'prueba', failing)
+    df = pd.DataFrame({'CAMPO': ['uno', 'malo', 'dos', 'malo']})
+
+    with pytest.raises(ValueError):
+        format_records(df, formats={'CAMPO': 'prueba'}, derived={})
+
+    errors = {}
+    result = format_records(df, formats={'CAMPO': 'prueba'}, derived={}, errors=errors)
+    assert result['CAMPO'].tolist() == ['UNO', '', 'DOS', '']
+    assert errors == {
+        1: 'No se pudo dar formato a CAMPO: valor inválido',
+        3: 'No se pudo dar formato a CAMPO: valor inválido',
+    }
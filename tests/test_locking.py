@@ -0,0 +1,45 @@
+# tests/test_locking.py
+import os
+import threading
+
+from locking import FileLock
+
+
+def test_lock_shared_between_threads(tmp_path):
+    path = str(tmp_path / 'x.lock')
+    lock = FileLock(path, timeout=5)
+    inside = []
+    overlaps = []
+    errors = []
+
+    def work():
+        try:
+            for _ in range(300):
+                with lock:
+                    inside.append(1)
+                    if len(inside) != 1:
+                        overlaps.append(len(inside))
+                    inside.pop()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert overlaps == []
+    assert not os.path.exists(path)
+
+
+def test_release_keeps_lock_taken_by_another_owner(tmp_path):
+    path = str(tmp_path / 'x.lock')
+    lock = FileLock(path)
+    lock.acquire()
+    # Otro proceso lo liberó por abandonado y lo volvió a tomar
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('otro')
+    lock.release()
+    assert os.path.exists(path)
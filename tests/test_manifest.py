@@ -0,0 +1,14 @@
+# tests/test_manifest.py
+from manifest import row_hash, settings_hash
+
+
+def test_row_hash_ignores_id_type_and_status():
+    assert row_hash({'ID': 1, 'A': None, 'GENERADO': 'No'}) == row_hash({'ID': '1', 'A': float('nan')})
+
+
+def test_row_hash_changes_with_settings():
+    record = {'ID': '1', 'MONTO_AUTORIZADO': '100'}
+    before = row_hash(record, settings=settings_hash(['PROVEEDOR'], {'MONTO_AUTORIZADO': 'moneda'}))
+    assert before == row_hash(record, settings=settings_hash(['PROVEEDOR'], {'MONTO_AUTORIZADO': 'moneda'}))
+    assert before != row_hash(record, settings=settings_hash([], {'MONTO_AUTORIZADO': 'moneda'}))
+    assert before != row_hash(record, settings=settings_hash(['PROVEEDOR'], {'MONTO_AUTORIZADO': 'numero'}))
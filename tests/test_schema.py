@@ -0,0 +1,12 @@
+# tests/test_schema.py
+import pytest
+
+from data_manager import get_columns
+from schema import FORM_ORDER, get_user_fields
+
+
+@pytest.mark.parametrize('contract_type', sorted(FORM_ORDER))
+def test_columns_include_form_fields(contract_type):
+    columns = get_columns(contract_type)
+    assert len(columns) == len(set(columns))
+    assert set(get_user_fields(contract_type)) <= set(columns)
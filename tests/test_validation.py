@@ -0,0 +1,32 @@
+# tests/test_validation.py
+import pandas as pd
+import pytest
+
+from data_manager import DataManager, validate_records
+
+
+@pytest.mark.parametrize('value, valid', [
+    ('150000.75', True),
+    ('-100', True),
+    ('0', True),
+    ('abc', False),
+    ('', False),
+    (None, False),
+    ('nan', False),
+    ('inf', False),
+    ('-inf', False),
+])
+def test_validate_number(value, valid):
+    assert DataManager.validate_number(None, value) is valid
+
+
+def test_validate_records_amounts():
+    amounts = ['150000.75', '-100', 'abc', 'nan', 'inf']
+    df = pd.DataFrame({
+        'NO_CONTRATO': ['C'] * len(amounts),
+        'PROVEEDOR': ['P'] * len(amounts),
+        'RFC': ['R'] * len(amounts),
+        'MONTO_AUTORIZADO': amounts,
+    })
+    message = "MONTO_AUTORIZADO debe ser numérico"
+    assert validate_records(df).tolist() == ['', '', message, message, message]